@@ -0,0 +1,471 @@
+from functools import wraps
+import time
+
+from Chapter7.link import _DoublyLinkedBase
+from Chapter9.priority_queue import AdaptableHeapPriorityQueue
+from Chapter10.map import MapBase
+
+class _RecencyList(_DoublyLinkedBase):
+    """Doubly linked list of cache entries, from most to least recently used."""
+
+    def add_first(self, e):
+        """Add element e at the front of the list and return its node."""
+        return self._insert_between(e, self._header, self._header._next)
+
+    def move_to_front(self, node):
+        """Relink node at the front of the list (without creating a new node)."""
+        node._prev._next = node._next
+        node._next._prev = node._prev
+        node._prev = self._header
+        node._next = self._header._next
+        self._header._next._prev = node
+        self._header._next = node
+
+    def header(self):
+        """Return the header sentinel (to add a node at the front with add_after)."""
+        return self._header
+
+    def add_after(self, node, e):
+        """Add element e just after node and return its node."""
+        return self._insert_between(e, node, node._next)
+
+    def first(self):
+        """Return the node at the front of the list (or None if empty)."""
+        return self._header._next if not self.is_empty() else None
+
+    def last(self):
+        """Return the node at the back of the list (or None if empty)."""
+        return self._trailer._prev if not self.is_empty() else None
+
+    def remove(self, node):
+        """Unlink node from the list and return its element."""
+        return self._delete_node(node)
+
+
+class CacheMapBase(MapBase):
+    """Abstract base class for a map that holds a bounded total weight of items.
+
+    By default every item weighs 1, so maxsize is the number of items;
+    weigher(k, v) may give another weight. Inserting beyond maxsize evicts
+    items chosen by the subclass policy, calling on_evict(k, v) for each.
+    An item heavier than maxsize is not stored at all.
+
+    Subclasses pair the hash map self._map (key -> linked node of its entry)
+    with an O(1) ordering structure, through the hooks _touch, _insert,
+    _unlink and _victim.
+    """
+    _MapType = dict
+
+    class _Entry(MapBase._Item):
+        """Cache entry also recording its weight and access frequency."""
+        __slots__ = '_weight', '_freq'
+
+        def __init__(self, k, v, weight):
+            super().__init__(k, v)
+            self._weight = weight
+            self._freq = 1
+
+    def __init__(self, maxsize=128, weigher=None, on_evict=None):
+        """Create an empty cache."""
+        self._maxsize = maxsize
+        self._weigher = weigher
+        self._on_evict = on_evict
+        self._map = self._MapType()     # key -> node holding its entry
+        self._weight = 0                # total weight of cached items
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    # nonpublic behaviours
+    def _weigh(self, k, v):
+        return 1 if self._weigher is None else self._weigher(k, v)
+
+    def _evict(self):
+        """Evict the item chosen by the replacement policy."""
+        entry = self._unlink(self._victim())
+        del self._map[entry._key]
+        self._evicted(entry)
+
+    def _evicted(self, entry):
+        """Account for an evicted entry and report it."""
+        self._evictions += 1
+        self._weight -= entry._weight
+        if self._on_evict is not None:
+            self._on_evict(entry._key, entry._value)
+
+    # public behaviours
+    def __len__(self):
+        """Return number of items in the cache."""
+        return len(self._map)
+
+    def __iter__(self):
+        """Generate iteration of the cached keys."""
+        return iter(self._map)
+
+    def __contains__(self, k):
+        """Return True if key k is cached (without counting an access)."""
+        return k in self._map
+
+    def __getitem__(self, k):
+        """Return value associated with key k (raise KeyError if not cached)."""
+        node = self._map.get(k)
+        if node is None:
+            self._misses += 1
+            raise KeyError('Key Error: ' + repr(k))
+        self._hits += 1
+        return self._touch(node)._element._value
+
+    def __setitem__(self, k, v):
+        """Assign value v to key k, evicting other items to make room."""
+        w = self._weigh(k, v)
+        if w > self._maxsize:           # too heavy to be cached at all
+            if k in self._map:
+                del self[k]
+            return
+        node = self._map.get(k)
+        if node is not None:
+            entry = node._element
+            self._weight += w - entry._weight
+            entry._value = v
+            entry._weight = w
+            self._touch(node)
+            while self._weight > self._maxsize:
+                self._evict()
+        else:
+            while self._weight + w > self._maxsize:
+                self._evict()
+            self._insert(self._Entry(k, v, w))
+            self._weight += w
+
+    def __delitem__(self, k):
+        """Remove item associated with key k (raise KeyError if not cached)."""
+        node = self._map.pop(k, None)
+        if node is None:
+            raise KeyError('Key Error: ' + repr(k))
+        self._weight -= self._unlink(node)._weight
+
+    def weight(self):
+        """Return total weight of the cached items."""
+        return self._weight
+
+    def stats(self):
+        """Return (hits, misses, evictions) counters."""
+        return (self._hits, self._misses, self._evictions)
+
+
+class LRUCacheMap(CacheMapBase):
+    """Cache map evicting the least recently used item."""
+
+    def __init__(self, maxsize=128, weigher=None, on_evict=None):
+        """Create an empty cache."""
+        super().__init__(maxsize, weigher, on_evict)
+        self._order = _RecencyList()
+
+    def _touch(self, node):
+        self._order.move_to_front(node)
+        return node
+
+    def _insert(self, entry):
+        self._map[entry._key] = self._order.add_first(entry)
+
+    def _unlink(self, node):
+        return self._order.remove(node)
+
+    def _victim(self):
+        return self._order.last()
+
+
+class LFUCacheMap(CacheMapBase):
+    """Cache map evicting the least frequently used item (least recent among ties).
+
+    Entries are kept in one recency list per access count, and those lists
+    are linked in increasing count order, so accesses and evictions take
+    O(1) time.
+    """
+
+    class _CountList(_RecencyList):
+        """Recency list of the entries with a given access count."""
+
+        def __init__(self, freq):
+            super().__init__()
+            self._freq = freq
+
+    def __init__(self, maxsize=128, weigher=None, on_evict=None):
+        """Create an empty cache."""
+        super().__init__(maxsize, weigher, on_evict)
+        self._counts = _RecencyList()   # _CountList's, from least to greatest count
+        self._freqs = {}                # access count -> node of its _CountList
+
+    def _count_node(self, freq, before):
+        """Return node of the list for count freq, creating it after node before if needed."""
+        node = self._freqs.get(freq)
+        if node is None:
+            node = self._freqs[freq] = self._counts.add_after(before, self._CountList(freq))
+        return node
+
+    def _touch(self, node):
+        entry = node._element
+        count_node = self._freqs[entry._freq]
+        target = self._count_node(entry._freq + 1, count_node)
+        self._unlink(node)
+        entry._freq += 1
+        node = self._map[entry._key] = target._element.add_first(entry)
+        return node
+
+    def _insert(self, entry):
+        entry._freq = 1
+        target = self._count_node(1, self._counts.header())
+        self._map[entry._key] = target._element.add_first(entry)
+
+    def _unlink(self, node):
+        f = node._element._freq
+        count_node = self._freqs[f]
+        entry = count_node._element.remove(node)
+        if count_node._element.is_empty():
+            del self._freqs[f]
+            self._counts.remove(count_node)
+        return entry
+
+    def _victim(self):
+        return self._counts.first()._element.last()
+
+
+class ARCCacheMap(CacheMapBase):
+    """Cache map with Adaptive Replacement Cache (ARC) eviction of up to maxsize items.
+
+    T1 holds items seen once recently and T2 items seen at least twice. The
+    ghost lists B1 and B2 remember keys (without values) recently evicted
+    from T1 and T2. Setting a key remembered in B1 or B2 moves the target
+    size p of T1 towards recency or frequency, whichever would have kept it.
+    """
+
+    class _Entry(CacheMapBase._Entry):
+        """Cache entry also recording the list holding it."""
+        __slots__ = '_list'
+
+    def __init__(self, maxsize=128, on_evict=None):
+        """Create an empty cache."""
+        super().__init__(maxsize, None, on_evict)
+        self._t1 = _RecencyList()
+        self._t2 = _RecencyList()
+        self._b1 = _RecencyList()
+        self._b2 = _RecencyList()
+        self._ghosts = {}       # key -> node in B1 or B2
+        self._p = 0             # target size of T1
+
+    def _move(self, node, target):
+        """Move the entry of node to the front of list target, and return its new node."""
+        entry = node._element
+        entry._list.remove(node)
+        entry._list = target
+        return target.add_first(entry)
+
+    def _replace(self, in_b2):
+        """Move the LRU item of T1 (or T2) to the ghost list B1 (or B2), evicting its value."""
+        t1 = len(self._t1)
+        if t1 > 0 and (t1 > self._p or (in_b2 and t1 == self._p) or self._t2.is_empty()):
+            source, ghost = self._t1, self._b1
+        else:
+            source, ghost = self._t2, self._b2
+        entry = source.last()._element
+        del self._map[entry._key]
+        self._ghosts[entry._key] = self._move(source.last(), ghost)
+        self._evicted(entry)
+        entry._value = None
+
+    def _drop_ghost(self, ghost):
+        """Forget the LRU key of ghost list B1 or B2."""
+        entry = ghost.remove(ghost.last())
+        del self._ghosts[entry._key]
+
+    def _touch(self, node):
+        node = self._map[node._element._key] = self._move(node, self._t2)
+        return node
+
+    def __setitem__(self, k, v):
+        """Assign value v to key k, evicting another item if the cache is full."""
+        c = self._maxsize
+        node = self._map.get(k)
+        if node is not None:                    # cached: now seen twice
+            node._element._value = v
+            self._touch(node)
+            return
+        node = self._ghosts.pop(k, None)
+        if node is not None:                    # remembered: adapt p, then cache in T2
+            entry = node._element
+            in_b2 = entry._list is self._b2
+            if in_b2:
+                self._p = max(0, self._p - max(len(self._b1) // len(self._b2), 1))
+            else:
+                self._p = min(c, self._p + max(len(self._b2) // len(self._b1), 1))
+            if len(self._map) >= c:
+                self._replace(in_b2)
+            entry._value = v
+            self._map[k] = self._move(node, self._t2)
+            self._weight += 1
+            return
+        # new key
+        if len(self._t1) + len(self._b1) >= c:
+            if len(self._t1) < c:
+                self._drop_ghost(self._b1)
+                if len(self._map) >= c:
+                    self._replace(False)
+            else:                               # B1 is empty: drop the LRU item of T1
+                entry = self._t1.remove(self._t1.last())
+                del self._map[entry._key]
+                self._evicted(entry)
+        else:
+            total = len(self._t1) + len(self._t2) + len(self._b1) + len(self._b2)
+            if total >= c:
+                if total >= 2 * c:
+                    self._drop_ghost(self._b2)
+                if len(self._map) >= c:
+                    self._replace(False)
+        entry = self._Entry(k, v, 1)
+        entry._list = self._t1
+        self._map[k] = self._t1.add_first(entry)
+        self._weight += 1
+
+    def __delitem__(self, k):
+        """Remove item associated with key k (raise KeyError if not cached)."""
+        node = self._map.pop(k, None)
+        if node is None:
+            raise KeyError('Key Error: ' + repr(k))
+        node._element._list.remove(node)
+        self._weight -= 1
+
+
+class ExpiringMap(MapBase):
+    """Map whose entries expire a given time-to-live (TTL) after being set.
+
+    Deadlines are kept in an adaptable heap, so expired entries are found
+    from the front of the heap instead of by scanning the map. They are
+    removed when accessed, by expire(), and a few at a time on each write.
+    Entries set with a TTL of None never expire; by default, entries get the
+    TTL of the map (None if not given). Times are given by clock().
+    """
+    _REAP_PER_WRITE = 2     # expired entries removed by each assignment
+    _DEFAULT = object()     # ttl argument meaning the default TTL of the map
+
+    def __init__(self, ttl=None, clock=time.monotonic, on_expire=None):
+        """Create an empty map with default TTL ttl (in seconds)."""
+        self._ttl = ttl
+        self._clock = clock
+        self._on_expire = on_expire
+        self._map = {}                              # key -> (value, locator or None)
+        self._deadlines = AdaptableHeapPriorityQueue()  # (deadline, key) locators
+
+    # nonpublic behaviours
+    def _expired(self, loc, now):
+        return loc is not None and loc._key <= now
+
+    def _remove(self, k):
+        """Remove key k from the map and the heap, and return its value."""
+        v, loc = self._map.pop(k)
+        if loc is not None:
+            self._deadlines.remove(loc)
+        return v
+
+    def _reap(self, now, limit=None):
+        """Remove up to limit entries expired at time now; return the number removed."""
+        count = 0
+        while not self._deadlines.is_empty() and (limit is None or count < limit):
+            deadline, k = self._deadlines.min()
+            if deadline > now:
+                break
+            v = self._remove(k)
+            count += 1
+            if self._on_expire is not None:
+                self._on_expire(k, v)
+        return count
+
+    # public behaviours
+    def expire(self):
+        """Remove all expired entries and return their number."""
+        return self._reap(self._clock())
+
+    def set(self, k, v, ttl=_DEFAULT):
+        """Assign value v to key k, expiring after ttl (never if None).
+
+        If ttl is not given, the default TTL of the map is used.
+        """
+        now = self._clock()
+        self._reap(now, self._REAP_PER_WRITE)
+        if ttl is self._DEFAULT:
+            ttl = self._ttl
+        deadline = None if ttl is None else now + ttl
+        old = self._map.get(k)
+        loc = None if old is None else old[1]
+        if deadline is None:
+            if loc is not None:
+                self._deadlines.remove(loc)
+                loc = None
+        elif loc is None:
+            loc = self._deadlines.add(deadline, k)
+        else:
+            self._deadlines.update(loc, deadline, k)
+        self._map[k] = (v, loc)
+
+    def ttl(self, k):
+        """Return remaining time to live of key k (None if it never expires)."""
+        self[k]                     # raise KeyError if missing or expired
+        loc = self._map[k][1]
+        return None if loc is None else loc._key - self._clock()
+
+    def __getitem__(self, k):
+        """Return value associated with key k (raise KeyError if missing or expired)."""
+        entry = self._map.get(k)
+        if entry is not None:
+            if not self._expired(entry[1], self._clock()):
+                return entry[0]
+            self._remove(k)
+            if self._on_expire is not None:
+                self._on_expire(k, entry[0])
+        raise KeyError('Key Error: ' + repr(k))
+
+    def __setitem__(self, k, v):
+        """Assign value v to key k with the default TTL of the map."""
+        self.set(k, v)
+
+    def __delitem__(self, k):
+        """Remove item associated with key k (raise KeyError if missing or expired)."""
+        self[k]
+        self._remove(k)
+
+    def __len__(self):
+        """Return number of unexpired items in the map."""
+        self.expire()
+        return len(self._map)
+
+    def __iter__(self):
+        """Generate iteration of the unexpired keys."""
+        self.expire()
+        for k in list(self._map):
+            if k in self._map:
+                yield k
+
+
+_KWD_MARK = object()    # separates positional from keyword arguments in memoize keys
+
+def memoize(map_cls=LRUCacheMap, maxsize=128, **kwargs):
+    """Decorator caching the results of a function in a cache map of type map_cls.
+
+    Arguments must be hashable. The cache is available as the `cache`
+    attribute of the decorated function.
+    """
+    def decorate(func):
+        cache = map_cls(maxsize=maxsize, **kwargs)
+
+        @wraps(func)
+        def wrapper(*args, **kw):
+            key = args + (_KWD_MARK,) + tuple(sorted(kw.items())) if kw else args
+            try:
+                return cache[key]
+            except KeyError:
+                pass
+            value = func(*args, **kw)
+            cache[key] = value
+            return value
+        wrapper.cache = cache
+        return wrapper
+    return decorate
@@ -0,0 +1,203 @@
+from heapq import merge
+import threading
+
+from Chapter10.map import MapBase, SortedTableMap
+from Chapter11.search_tree import RedBlackTreeMap
+
+class LSMTreeMap(MapBase):
+    """Sorted map implemented as a log-structured merge tree.
+
+    Writes go to a mutable in-memory memtable (a red-black tree). When it holds
+    memtable_size entries, it is flushed to an immutable SortedTableMap run.
+    Runs are kept newest first, and a newer run is merged into the older one
+    next to it once it reaches 1/ratio of its size, so there are O(log n) runs
+    and each entry is merged O(log n) times. Deletions write a tombstone, which
+    is dropped when it is merged into the oldest run.
+
+    If background is True, merging is done by a background thread. Reads work
+    on a snapshot of the run list, which is replaced but never modified in
+    place, so they never see a half-done merge. The map is otherwise meant for
+    one thread.
+    """
+    _TOMBSTONE = object()   # value marking a deleted key
+    _MISSING = object()     # key not found in a memtable or run
+
+    def __init__(self, memtable_size=1024, ratio=2, background=False):
+        """Create an empty map."""
+        self._memtable = RedBlackTreeMap()
+        self._runs = []         # immutable SortedTableMap runs, newest first
+        self._memtable_size = memtable_size
+        self._ratio = ratio
+        self._background = background
+        self._lock = threading.Lock()   # guards replacing self._runs and self._compactor
+        self._compactor = None          # background merging thread (if running)
+
+    # nonpublic behaviours
+    def _sources(self):
+        """Return the memtable and the runs, newest first."""
+        return [self._memtable] + self._runs
+
+    def _lookup(self, k, sources):
+        """Return the newest value for key k in sources (may be _TOMBSTONE or _MISSING)."""
+        for source in sources:
+            v = source.get(k, self._MISSING)
+            if v is not self._MISSING:
+                return v
+        return self._MISSING
+
+    @staticmethod
+    def _tagged(items, age):
+        """Generate (key, age, value) triples from (key, value) pairs."""
+        for k, v in items:
+            yield (k, age, v)
+
+    def _merged(self, sources, start, stop, drop_tombstones=True):
+        """Generate (key, value) pairs with start <= key < stop merged across sources.
+
+        For each key only the newest value is kept.
+        """
+        streams = [self._tagged(source.find_range(start, stop), age)
+                   for age, source in enumerate(sources)]
+        last = self._MISSING
+        for k, _, v in merge(*streams):     # ties on k come newest (lowest age) first
+            if last is not self._MISSING and k == last:
+                continue
+            last = k
+            if not (drop_tombstones and v is self._TOMBSTONE):
+                yield (k, v)
+
+    def _flush(self):
+        """Move the memtable into a new run."""
+        run = SortedTableMap.from_items(self._memtable.find_range(None, None), presorted=True)
+        self._memtable = RedBlackTreeMap()
+        with self._lock:
+            self._runs = [run] + self._runs
+            if self._background and self._compactor is None:
+                self._compactor = threading.Thread(target=self._compact, daemon=True)
+                self._compactor.start()
+        if not self._background:
+            self._compact()
+
+    def _pick_merge(self, runs):
+        """Return index i such that runs[i] should be merged into runs[i+1] (or None)."""
+        for i in range(len(runs) - 1):
+            if len(runs[i]) * self._ratio >= len(runs[i+1]):
+                return i
+        return None
+
+    def _compact(self):
+        """Merge adjacent runs until no run is too large for the older one next to it."""
+        while True:
+            with self._lock:
+                runs = self._runs
+                i = self._pick_merge(runs)
+                if i is None:
+                    self._compactor = None  # checked under the same lock by _flush
+                    return
+            newer, older = runs[i], runs[i+1]
+            oldest = (i + 1 == len(runs) - 1)   # flushes only add runs at the front
+            items = self._merged([newer, older], None, None, drop_tombstones=oldest)
+            run = SortedTableMap.from_items(items, presorted=True)
+            with self._lock:
+                runs = self._runs
+                j = next(j for j, r in enumerate(runs) if r is newer)
+                self._runs = runs[:j] + [run] + runs[j+2:]
+
+    # public behaviours
+    def wait(self):
+        """Wait until background merging (if any) has finished."""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def compact(self):
+        """Flush the memtable and merge all runs into a single one."""
+        self.wait()
+        sources = self._sources()
+        run = SortedTableMap.from_items(self._merged(sources, None, None), presorted=True)
+        self._memtable = RedBlackTreeMap()
+        with self._lock:
+            self._runs = [run]
+
+    def __len__(self):
+        """Return number of items in the map (this merges all runs: O(n))."""
+        return sum(1 for _ in self._merged(self._sources(), None, None))
+
+    def __getitem__(self, k):
+        """Return value associated with key k (raise KeyError if not found)."""
+        v = self._lookup(k, self._sources())
+        if v is self._MISSING or v is self._TOMBSTONE:
+            raise KeyError('Key Error: ' + repr(k))
+        return v
+
+    def __setitem__(self, k, v):
+        """Assign value v to key k, overwriting existing value if present."""
+        self._memtable[k] = v
+        if len(self._memtable) >= self._memtable_size:
+            self._flush()
+
+    def __delitem__(self, k):
+        """Remove item associated with key k (raise KeyError if not found)."""
+        if k not in self:
+            raise KeyError('Key Error: ' + repr(k))
+        self[k] = self._TOMBSTONE
+
+    def __iter__(self):
+        """Generate keys of the map ordered from minimum to maximum."""
+        for k, v in self._merged(self._sources(), None, None):
+            yield k
+
+    def find_range(self, start, stop):
+        """Iterate all (key, value) pairs such that start <= key < stop.
+
+        If start is None, iteration begins with minimum key of map.
+        If stop is None, iteration continues through the maximum key of map.
+        """
+        return self._merged(self._sources(), start, stop)
+
+    def find_min(self):
+        """Return (key, value) pair with minimum key (or None if empty)."""
+        return next(self.find_range(None, None), None)
+
+    def find_ge(self, k):
+        """Return (key, value) pair with least key greater than or equal to k."""
+        return next(self.find_range(k, None), None)
+
+    def find_gt(self, k):
+        """Return (key, value) pair with least key strictly greater than k."""
+        for item in self.find_range(k, None):
+            if item[0] != k:
+                return item
+        return None
+
+    def _find_back(self, k, strict):
+        """Return (key, value) pair with greatest key <= k (< k if strict),
+        or with greatest key overall if k is None."""
+        sources = self._sources()
+        while True:
+            if k is None:
+                found = [source.find_max() for source in sources]
+            elif strict:
+                found = [source.find_lt(k) for source in sources]
+            else:
+                found = [source.find_le(k) for source in sources]
+            keys = [item[0] for item in found if item is not None]
+            if not keys:
+                return None
+            k = max(keys)
+            v = self._lookup(k, sources)
+            if v is not self._TOMBSTONE:
+                return (k, v)
+            strict = True       # key was deleted: look below it
+
+    def find_max(self):
+        """Return (key, value) pair with maximum key (or None if empty)."""
+        return self._find_back(None, False)
+
+    def find_le(self, k):
+        """Return (key, value) pair with greatest key less than or equal to k."""
+        return self._find_back(k, False)
+
+    def find_lt(self, k):
+        """Return (key, value) pair with greatest key strictly less than k."""
+        return self._find_back(k, True)
@@ -1,4 +1,12 @@
-from collections import MutableMapping
+from collections.abc import MutableMapping
+from array import array
+from bisect import bisect_left, bisect_right
+from math import ceil
+import mmap
+import pickle
+import struct
+import sys
+import threading
 
 class MapBase(MutableMapping):
     """Abstract base class that includes a nonpublic _Item class."""
@@ -20,6 +28,39 @@ class MapBase(MutableMapping):
         def __lt__(self, other):
             return self._key < other._key
 
+    # bulk behaviours (subclasses override them with faster versions)
+    @classmethod
+    def from_items(cls, iterable, presorted=False):
+        """Create a map holding the (key, value) pairs of iterable.
+
+        If a key appears more than once, its last value wins.
+        If presorted is True, the pairs are known to be in increasing key order.
+        """
+        m = cls()
+        m.update_many(iterable, presorted)
+        return m
+
+    def update_many(self, iterable, presorted=False):
+        """Assign each (key, value) pair of iterable, overwriting existing values."""
+        for k, v in iterable:
+            self[k] = v
+
+    def get_many(self, keys, default=None):
+        """Return list of values associated with keys (default for missing keys)."""
+        return [self.get(k, default) for k in keys]
+
+    def delete_many(self, keys):
+        """Remove items associated with keys, skipping missing keys.
+        Return the number of items removed."""
+        count = 0
+        for k in keys:
+            try:
+                del self[k]
+                count += 1
+            except KeyError:
+                pass
+        return count
+
 class UnsortedTableMap(MapBase):
     """Map implementation using an unordered list."""
 
@@ -59,18 +100,56 @@ class UnsortedTableMap(MapBase):
         for item in self._table:
             yield item._key
 
-from random import randrange
+    def update_many(self, iterable, presorted=False):
+        """Assign each (key, value) pair of iterable with one pass over the table.
+        Keys must be hashable."""
+        index = {item._key: item for item in self._table}
+        for k, v in iterable:
+            item = index.get(k)
+            if item is None:
+                item = index[k] = self._Item(k, v)
+                self._table.append(item)
+            else:
+                item._value = v
+
+    def delete_many(self, keys):
+        """Remove items associated with keys with one pass over the table.
+        Keys must be hashable. Return the number of items removed."""
+        doomed = set(keys)
+        kept = [item for item in self._table if item._key not in doomed]
+        count = len(self._table) - len(kept)
+        self._table = kept
+        return count
+
+from random import randrange, random, choice
 
 class HashMapBase(MapBase):
-    """Abstract base class for map using hash-table with MAD compression."""
+    """Abstract base class for map using hash-table with MAD compression.
+
+    The resize policy is set by growth (factor applied to the capacity when
+    the table grows), max_load (largest load factor allowed) and shrink (halve
+    the table when deletions bring the load under max_load / 4).
 
-    def __init__(self, cap=1, p=109345121):
+    With incremental=True a resize does not rehash everything at once: the old
+    and new tables coexist, and each operation migrates `step` buckets of the
+    old table into the new one until it is empty.
+    """
+
+    def __init__(self, cap=1, p=109345121, growth=2, max_load=0.5, shrink=False,
+                 incremental=False, step=4):
         """Create an empty hash-table map."""
         self._table = cap * [None]
         self._n = 0         # number of entries in the map
         self._prime = p     # prime for MAD compression
         self._scale = 1 + randrange(p-1)    # scale from 1 to p-1 for MAD
         self._shift = randrange(p)          # shift from 0 to p-1 for MAD
+        self._growth = growth
+        self._max_load = max_load
+        self._shrink = shrink
+        self._incremental = incremental
+        self._step = step   # buckets migrated per operation during a resize
+        self._old = None    # table being migrated away from (if any)
+        self._cursor = 0    # next bucket of the old table to migrate
 
     def _hash_function(self, k):
         return (hash(k) * self._scale + self._shift) % self._prime % len(self._table)
@@ -79,62 +158,196 @@ class HashMapBase(MapBase):
         return self._n
     
     def __getitem__(self, k):
+        if self._old is not None:
+            self._rehash_step()
         j = self._hash_function(k)
-        return self._bucket_getitem(j, k)   # may raise KeyError
+        if self._old is None:
+            return self._bucket_getitem(j, k)   # may raise KeyError
+        try:
+            return self._bucket_getitem(j, k)
+        except KeyError:
+            return self._old_bucket(self._bucket_getitem, k)
 
     def __setitem__(self, k, v):
+        if self._old is not None:
+            self._rehash_step()
+            if self._old is not None and self._in_old(k):
+                self._old_bucket(self._bucket_setitem, k, v)    # update in place
+                return
         j = self._hash_function(k)
         self._bucket_setitem(j, k, v)       # subroutine maintains self._n
-        if self._n > len(self._table) // 2: # keep load factor <= 0.5
-            self._resize(2 * len(self._table) - 1)  # number 2^x -1 is often prime
+        self._grow_if_needed()
     
     def __delitem__(self, k):
+        if self._old is not None:
+            self._rehash_step()
         j = self._hash_function(k)
-        self._bucket_delitem(j, k)
+        if self._old is None:
+            self._bucket_delitem(j, k)
+        else:
+            try:
+                self._bucket_delitem(j, k)
+            except KeyError:
+                self._old_bucket(self._bucket_delitem, k)
         self._n -= 1
+        self._shrink_if_needed()
+
+    def __iter__(self):
+        self._finish_rehash()
+        return self._table_iter()
+
+    def update_many(self, iterable, presorted=False):
+        """Assign each (key, value) pair of iterable, sizing the table once for all of them."""
+        batch = iterable if isinstance(iterable, list) else list(iterable)
+        c = int((self._n + len(batch)) / self._max_load) + 1
+        if c > len(self._table):
+            self._resize(c)
+        for k, v in batch:
+            self[k] = v
+
+    def _grow_if_needed(self):
+        if self._n > len(self._table) * self._max_load:    # keep load factor <= max_load
+            # number 2^x -1 is often prime
+            self._resize(max(int(self._growth * len(self._table)) - 1, len(self._table) + 1))
+
+    def _shrink_if_needed(self):
+        if self._shrink and len(self._table) > 1 and self._n < len(self._table) * self._max_load / 4:
+            self._resize(max(int(len(self._table) / self._growth), 1))
     
     def _resize(self, c):           # resize bucket array to capacity c
+        if self._incremental:
+            self._finish_rehash()   # at most one resize in progress
+            self._old = self._table
+            self._table = c * [None]
+            self._cursor = 0
+            return
         old = list(self.items())    # use iteration to record existing items
         self._table = c * [None]    # reset table to desired capacity
         self._n = 0                 # n recomputed during subsequenct adds
         for (k, v) in old:
             self[k] = v             # reinsert old key-value pair
 
+    # support for incremental resizing
+    def _old_bucket(self, method, k, *args):
+        """Apply bucket method for key k to the old table of a resize in progress."""
+        table = self._table
+        self._table = self._old     # so that _hash_function and method see the old table
+        try:
+            return method(self._hash_function(k), k, *args)
+        finally:
+            self._table = table
+
+    def _in_old(self, k):
+        """Return True if key k is still stored in the old table."""
+        try:
+            self._old_bucket(self._bucket_getitem, k)
+            return True
+        except KeyError:
+            return False
+
+    def _rehash_step(self):
+        """Migrate the next `step` buckets of the old table into the current one."""
+        old = self._old
+        for _ in range(self._step):
+            items = self._drain_bucket(old, self._cursor)
+            self._cursor += 1
+            self._n -= len(items)   # recounted by _bucket_setitem
+            for (k, v) in items:
+                self._bucket_setitem(self._hash_function(k), k, v)
+            if self._cursor == len(old):
+                self._old = None
+                return
+
+    def _finish_rehash(self):
+        """Complete a resize in progress, if any."""
+        while self._old is not None:
+            self._rehash_step()
+
 
 class ChainHashMap(HashMapBase):
-    """Hash map implemented with separate chaining for collision resolution."""
+    """Hash map implemented with separate chaining for collision resolution.
+
+    Each bucket is stored inline in the table: None when empty, a (k, v) tuple
+    for a single item, and only after a collision a flat list [k1, v1, k2, v2, ...].
+    """
 
     def _bucket_getitem(self, j, k):
         bucket = self._table[j]
-        if bucket is None:
-            raise KeyError('Key Error: ' + repr(k))
-        return bucket[k]
+        if bucket is not None:
+            if type(bucket) is tuple:
+                if k == bucket[0]:
+                    return bucket[1]
+            else:
+                for i in range(0, len(bucket), 2):
+                    if k == bucket[i]:
+                        return bucket[i+1]
+        raise KeyError('Key Error: ' + repr(k))
     
     def _bucket_setitem(self, j, k, v):
-        if self._table[j] is None:
-            self._table[j] = UnsortedTableMap()
-        oldsize = len(self._table[j])
-        self._table[j][k] = v
-        if len(self._table[j]) > oldsize:   # key is new to the table
-            self._n += 1
+        bucket = self._table[j]
+        if bucket is None:
+            self._table[j] = (k, v)
+        elif type(bucket) is tuple:
+            if k == bucket[0]:
+                self._table[j] = (k, v)
+                return
+            self._table[j] = [bucket[0], bucket[1], k, v]    # collision: start a chain
+        else:
+            for i in range(0, len(bucket), 2):
+                if k == bucket[i]:
+                    bucket[i+1] = v
+                    return
+            bucket.append(k)
+            bucket.append(v)
+        self._n += 1            # key is new to the table
         
     def _bucket_delitem(self, j, k):
         bucket = self._table[j]
-        if bucket is None:
-            raise KeyError('Key Errorn: ' + repr(k))
-        del bucket[k]
+        if bucket is not None:
+            if type(bucket) is tuple:
+                if k == bucket[0]:
+                    self._table[j] = None
+                    return
+            else:
+                for i in range(0, len(bucket), 2):
+                    if k == bucket[i]:
+                        del bucket[i:i+2]
+                        if len(bucket) == 2:    # back to a single item
+                            self._table[j] = (bucket[0], bucket[1])
+                        return
+        raise KeyError('Key Error: ' + repr(k))
     
-    def __iter__(self):
+    def _drain_bucket(self, table, j):
+        bucket = table[j]
+        table[j] = None
+        if bucket is None:
+            return []
+        elif type(bucket) is tuple:
+            return [bucket]
+        else:
+            return list(zip(bucket[0::2], bucket[1::2]))
+
+    def _table_iter(self):
         for bucket in self._table:
-            if bucket is not None:      # a nonempty slot
-                for key in bucket._key:
-                    yield key 
+            if bucket is None:
+                continue
+            elif type(bucket) is tuple:
+                yield bucket[0]
+            else:
+                yield from bucket[0::2]
 
 
 class ProbeHashMap(HashMapBase):
     """Hash map implemented with linear probing for collision resolution."""
     _AVAIL = object()   # sentinal marks locations of previous deletions
 
+    def __init__(self, cap=1, p=109345121, growth=2, max_load=0.5, shrink=False,
+                 incremental=False, step=4):
+        """Create an empty hash-table map."""
+        if max_load >= 1:
+            raise ValueError('max_load must be less than 1 for open addressing')
+        super().__init__(cap, p, growth, max_load, shrink, incremental, step)
+
     def _is_available(self, j):
         """Return True if index j is available in table."""
         return self._table[j] is None or self._table[j] is ProbeHashMap._AVAIL
@@ -145,9 +358,11 @@ class ProbeHashMap(HashMapBase):
         Return (success, index) tuple, descibed as follows:
         If match was found, success is True and index denotes its location.
         If no match found, success is False and index denotes first available slot.
+        The search stops after one full cycle, since a table (such as the old
+        table of an incremental resize) may have no empty slot left.
         """
         firstAvail = None 
-        while True:
+        for _ in range(len(self._table)):
             if self._is_available(j):
                 if firstAvail is None:
                     firstAvail = j      # mark this as first avail
@@ -156,11 +371,12 @@ class ProbeHashMap(HashMapBase):
             elif k == self._table[j]._key:
                 return (True, j)
             j = (j+1) % len(self._table)        # keep looking (cyclically)
+        return (False, firstAvail)
     
     def _bucket_getitem(self, j, k):
         found, s = self._find_slot(j, k)
         if not found:
-            raise KeyError('Key Error: ', + repr(k))
+            raise KeyError('Key Error: ' + repr(k))
         return self._table[s]._value
 
     def _bucket_setitem(self, j, k, v):
@@ -177,152 +393,917 @@ class ProbeHashMap(HashMapBase):
             raise KeyError('Key Error:' + repr(k))
         self._table[s] = ProbeHashMap._AVAIL    # mark as vacated
 
-    def __iter__(self):
+    def _drain_bucket(self, table, j):
+        item = table[j]
+        if item is None or item is ProbeHashMap._AVAIL:
+            return []
+        table[j] = ProbeHashMap._AVAIL  # keep probe sequences through this slot intact
+        return [(item._key, item._value)]
+
+    def _table_iter(self):
         for j in range(len(self._table)):
             if not self._is_available(j):
                 yield self._table[j]._key
 
 
+class CompactProbeHashMap(HashMapBase):
+    """Hash map implemented with Robin Hood linear probing over parallel arrays.
+
+    Instead of one _Item per slot, each key's cached hash, its probe distance,
+    the key and its value are kept in parallel arrays (hashes and distances
+    in compact array('q') and array('i') storage). A probe compares the
+    cached hash before the key, and resizing reuses the cached hashes.
+    Resizing is always done at once (incremental=False).
+    """
+    _EMPTY = object()   # sentinel marks empty slots of the key array
+
+    def __init__(self, cap=8, p=109345121, growth=2, max_load=0.5, shrink=False):
+        """Create an empty hash-table map."""
+        if max_load >= 1:
+            raise ValueError('max_load must be less than 1 for open addressing')
+        super().__init__(cap, p, growth, max_load, shrink)
+        self._table = cap * [self._EMPTY]   # keys
+        self._values = cap * [None]
+        self._hashes = array('q', [0]) * cap
+        self._dists = array('i', [0]) * cap  # distance of each entry from its home slot
+
+    def _home(self, h):
+        """Return the home slot for a key with hash h (MAD compression)."""
+        return (h * self._scale + self._shift) % self._prime % len(self._table)
+
+    def _find_slot(self, k, h):
+        """Return index of the slot holding key k with hash h, or -1 if not found."""
+        keys, hashes, dists = self._table, self._hashes, self._dists
+        cap = len(keys)
+        j = self._home(h)
+        dist = 0
+        while keys[j] is not self._EMPTY and dists[j] >= dist:
+            if hashes[j] == h and (keys[j] is k or keys[j] == k):
+                return j
+            j = (j + 1) % cap       # keep looking (cyclically)
+            dist += 1
+        return -1                   # a richer entry would have been displaced
+
+    def _insert(self, h, k, v):
+        """Insert a new key k with hash h, displacing entries closer to home."""
+        keys, values, hashes, dists = self._table, self._values, self._hashes, self._dists
+        cap = len(keys)
+        j = self._home(h)
+        dist = 0
+        while keys[j] is not self._EMPTY:
+            if dists[j] < dist:     # take from the rich: swap with the resident
+                h, hashes[j] = hashes[j], h
+                k, keys[j] = keys[j], k
+                v, values[j] = values[j], v
+                dist, dists[j] = dists[j], dist
+            j = (j + 1) % cap
+            dist += 1
+        hashes[j], keys[j], values[j], dists[j] = h, k, v, dist
+
+    def __getitem__(self, k):
+        j = self._find_slot(k, hash(k))
+        if j < 0:
+            raise KeyError('Key Error: ' + repr(k))
+        return self._values[j]
+
+    def __setitem__(self, k, v):
+        h = hash(k)
+        j = self._find_slot(k, h)
+        if j >= 0:
+            self._values[j] = v
+            return
+        self._insert(h, k, v)
+        self._n += 1
+        self._grow_if_needed()
+
+    def __delitem__(self, k):
+        j = self._find_slot(k, hash(k))
+        if j < 0:
+            raise KeyError('Key Error: ' + repr(k))
+        keys, values, hashes, dists = self._table, self._values, self._hashes, self._dists
+        cap = len(keys)
+        nxt = (j + 1) % cap
+        while keys[nxt] is not self._EMPTY and dists[nxt] > 0:   # shift back, no tombstones
+            hashes[j], keys[j], values[j] = hashes[nxt], keys[nxt], values[nxt]
+            dists[j] = dists[nxt] - 1
+            j = nxt
+            nxt = (j + 1) % cap
+        keys[j] = self._EMPTY
+        values[j] = None
+        self._n -= 1
+        self._shrink_if_needed()
+
+    def _resize(self, c):
+        old = [(self._hashes[j], self._table[j], self._values[j])
+               for j in range(len(self._table)) if self._table[j] is not self._EMPTY]
+        self._table = c * [self._EMPTY]
+        self._values = c * [None]
+        self._hashes = array('q', [0]) * c
+        self._dists = array('i', [0]) * c
+        for (h, k, v) in old:
+            self._insert(h, k, v)   # cached hash: no need to rehash k
+
+    def _table_iter(self):
+        for k in self._table:
+            if k is not self._EMPTY:
+                yield k
+
+
+class CuckooHashMap(HashMapBase):
+    """Hash map implemented with bucketized cuckoo hashing.
+
+    Each key may live only in one of d buckets, chosen by d independent MAD
+    hash functions, each bucket holding up to `slots` items, or in a small
+    stash. A lookup therefore probes at most d buckets and the stash.
+    An insertion into full buckets evicts an item to one of its other buckets,
+    and so on; if that goes on for too long (a cycle), the homeless item goes
+    to the stash, and once the stash is full the table is rebuilt with new
+    hash functions.
+
+    All d hash functions are derived from hash(k), so keys with equal hashes
+    share their buckets. If rebuilding keeps failing because of such keys,
+    the stash is allowed to overflow rather than rebuild forever.
+    """
+    _MAX_KICKS = 100    # evictions tried before giving up on an insertion
+    _MAX_REBUILDS = 6   # failed rebuilds before the stash may overflow
+
+    def __init__(self, cap=8, p=109345121, d=2, slots=4, stash=4, growth=2, max_load=0.9,
+                 shrink=False):
+        """Create an empty hash-table map."""
+        super().__init__(cap, p, growth, max_load, shrink)
+        self._table = [[] for _ in range(cap)]  # buckets of up to `slots` items
+        self._d = d
+        self._slots = slots
+        self._stash_size = stash
+        self._stash = []
+        self._reseed()
+
+    def _reseed(self):
+        """Draw new MAD parameters for the d hash functions."""
+        self._scales = [1 + randrange(self._prime-1) for _ in range(self._d)]
+        self._shifts = [randrange(self._prime) for _ in range(self._d)]
+
+    def _hash_function(self, k, i=0):
+        return (hash(k) * self._scales[i] + self._shifts[i]) % self._prime % len(self._table)
+
+    def _capacity(self):
+        return len(self._table) * self._slots
+
+    def _find(self, k):
+        """Return (list, index) locating the item with key k, or None if not found."""
+        for i in range(self._d):
+            bucket = self._table[self._hash_function(k, i)]
+            for s in range(len(bucket)):
+                if bucket[s]._key == k:
+                    return bucket, s
+        for s in range(len(self._stash)):
+            if self._stash[s]._key == k:
+                return self._stash, s
+        return None
+
+    def _place(self, item):
+        """Place a new item, evicting others as needed.
+        Return None on success, or the item left without a place."""
+        for _ in range(self._MAX_KICKS):
+            buckets = [self._table[self._hash_function(item._key, i)] for i in range(self._d)]
+            for bucket in buckets:
+                if len(bucket) < self._slots:
+                    bucket.append(item)
+                    return None
+            bucket = choice(buckets)            # all full: evict a random resident
+            s = randrange(len(bucket))
+            item, bucket[s] = bucket[s], item
+        if len(self._stash) < self._stash_size:
+            self._stash.append(item)
+            return None
+        return item
+
+    def _rebuild(self, c, extra=None):
+        """Rebuild the table with c buckets and new hash functions."""
+        items = [item for bucket in self._table for item in bucket] + self._stash
+        if extra is not None:
+            items.append(extra)
+        for failures in range(self._MAX_REBUILDS + 1):
+            if failures > 0 and failures % 3 == 0:  # new hash functions alone do not help: grow
+                c = int(self._growth * c) + 1
+            self._table = [[] for _ in range(c)]
+            self._stash = []
+            self._reseed()
+            homeless = [h for h in map(self._place, items) if h is not None]
+            if not homeless:
+                return
+        self._stash.extend(homeless)    # give up: let the stash overflow
+
+    def _resize(self, c):
+        self._rebuild(c)
+
+    def __getitem__(self, k):
+        found = self._find(k)
+        if found is None:
+            raise KeyError('Key Error: ' + repr(k))
+        bucket, s = found
+        return bucket[s]._value
+
+    def __setitem__(self, k, v):
+        found = self._find(k)
+        if found is not None:
+            bucket, s = found
+            bucket[s]._value = v
+            return
+        self._n += 1
+        homeless = self._place(self._Item(k, v))
+        if self._n > self._capacity() * self._max_load:
+            self._rebuild(int(self._growth * len(self._table)) + 1, homeless)
+        elif homeless is not None:
+            if len(self._stash) > self._stash_size:     # already overflowing
+                self._stash.append(homeless)
+            else:
+                self._rebuild(len(self._table), homeless)
+
+    def __delitem__(self, k):
+        found = self._find(k)
+        if found is None:
+            raise KeyError('Key Error: ' + repr(k))
+        bucket, s = found
+        bucket.pop(s)
+        self._n -= 1
+        if self._shrink and len(self._table) > 1 and self._n < self._capacity() * self._max_load / 4:
+            self._rebuild(max(int(len(self._table) / self._growth), 1))
+
+    def update_many(self, iterable, presorted=False):
+        """Assign each (key, value) pair of iterable, sizing the table once for all of them."""
+        batch = iterable if isinstance(iterable, list) else list(iterable)
+        c = ceil((self._n + len(batch)) / (self._slots * self._max_load))   # buckets hold `slots` items
+        if c > len(self._table):
+            self._rebuild(c)
+        for k, v in batch:
+            self[k] = v
+
+    def _table_iter(self):
+        for bucket in self._table:
+            for item in bucket:
+                yield item._key
+        for item in self._stash:
+            yield item._key
+
+
+class ConcurrentHashMap(MapBase):
+    """Thread-safe hash map striped over independent segments.
+
+    The key space is split over `segments` hash maps of type map_type, each
+    guarded by its own lock and resized on its own, so threads working on
+    different segments do not wait for each other.
+    """
+
+    _MISSING = object()     # pop argument meaning no default was given
+
+    def __init__(self, segments=16, map_type=ChainHashMap):
+        """Create an empty map."""
+        self._segments = [map_type() for _ in range(segments)]
+        self._locks = [threading.RLock() for _ in range(segments)]   # reentrant for callbacks
+
+    def _stripe(self, k):
+        """Return (segment, lock) responsible for key k."""
+        j = hash(k) % len(self._segments)
+        return self._segments[j], self._locks[j]
+
+    def __len__(self):
+        """Return number of items in the map (segments are counted one at a time)."""
+        total = 0
+        for segment, lock in zip(self._segments, self._locks):
+            with lock:
+                total += len(segment)
+        return total
+
+    def __getitem__(self, k):
+        segment, lock = self._stripe(k)
+        with lock:
+            return segment[k]
+
+    def __setitem__(self, k, v):
+        segment, lock = self._stripe(k)
+        with lock:
+            segment[k] = v
+
+    def __delitem__(self, k):
+        segment, lock = self._stripe(k)
+        with lock:
+            del segment[k]
+
+    def __iter__(self):
+        """Generate keys of the map, taking a snapshot of one segment at a time."""
+        for segment, lock in zip(self._segments, self._locks):
+            with lock:
+                keys = list(segment)
+            yield from keys
+
+    def get_or_insert(self, k, v):
+        """Return value associated with key k, first assigning v if k is absent."""
+        segment, lock = self._stripe(k)
+        with lock:
+            try:
+                return segment[k]
+            except KeyError:
+                segment[k] = v
+                return v
+
+    def compute_if_absent(self, k, func):
+        """Return value associated with key k, first assigning func(k) if k is absent.
+        func is called at most once, while the segment of k is locked."""
+        segment, lock = self._stripe(k)
+        with lock:
+            try:
+                return segment[k]
+            except KeyError:
+                v = segment[k] = func(k)
+                return v
+
+    def merge(self, k, v, func):
+        """Assign v to key k if absent, else func(old value, v); return the new value.
+        If func returns None, the item is removed instead."""
+        segment, lock = self._stripe(k)
+        with lock:
+            try:
+                old = segment[k]
+            except KeyError:
+                segment[k] = v
+                return v
+            new = func(old, v)
+            if new is None:
+                del segment[k]
+            else:
+                segment[k] = new
+            return new
+
+    def pop(self, k, default=_MISSING):
+        """Remove item with key k and return its value, or default if k is absent
+        (raise KeyError if no default is given)."""
+        segment, lock = self._stripe(k)
+        with lock:
+            try:
+                v = segment[k]
+            except KeyError:
+                if default is self._MISSING:
+                    raise
+                return default
+            del segment[k]
+            return v
+
+    def setdefault(self, k, default=None):
+        """Return value associated with key k, first assigning default if k is absent."""
+        return self.get_or_insert(k, default)
+
+    def popitem(self):
+        """Remove and return an arbitrary (key, value) pair (raise KeyError if empty)."""
+        for segment, lock in zip(self._segments, self._locks):
+            with lock:
+                if len(segment) > 0:
+                    return segment.popitem()
+        raise KeyError('popitem(): map is empty')
+
+
 class SortedTableMap(MapBase):
-    """Map implementation using a sorted table."""
+    """Map implementation using a sorted table.
+
+    The table is stored by columns: a sorted list of keys searched with
+    bisect, and a parallel list of values.
+    """
 
     # nonpublic behaviours
-    def _find_index(self, k, low, high):
+    def _find_index(self, k, low=0, high=None):
         """Return index of the leftmost item with key greater than or equal to k.
         Return high + 1 if no such item qualifies.
 
         That is, j will be returned such that:
-            all items of slice table[low:j] have key < k
-            all items of slice table[j:high+1] have key >= k
+            all items of slice keys[low:j] have key < k
+            all items of slice keys[j:high+1] have key >= k
         """
-        if high < low:
-            return high + 1
-        else:
-            mid = (low + high) // 2
-            if k == self._table[mid]._key:
-                return mid 
-            elif k < self._table[mid]._key:
-                return self._find_index(k, low, mid-1)  # Note: may return mid
-            else:
-                return self._find_index(k, mid+1, high)
+        if high is None:
+            high = len(self._keys) - 1
+        return bisect_left(self._keys, k, low, high + 1)
+
+    def _item(self, j):
+        """Return (key, value) pair at index j."""
+        return (self._keys[j], self._values[j])
     
     # public behaviours
     def __init__(self):
         """Create an empty map."""
-        self._table = []
+        self._keys = []
+        self._values = []
     
     def __len__(self):
         """Return number of items in the map."""
-        return len(self._table)
+        return len(self._keys)
     
     def __getitem__(self, k):
         """Return value associated with key k (raise KeyError if not found)."""
-        j = self._find_index(k, 0, len(self._table) - 1)
-        if j == len(self._table) or self._table[j]._key != k:
+        j = self._find_index(k)
+        if j == len(self._keys) or self._keys[j] != k:
             raise KeyError('Key Error:' + repr(k))
-        return self._table[j]._value
+        return self._values[j]
     
     def __setitem__(self, k, v):
         """Assign value v to key k, overwriting existing value if present."""
-        j = self._find_index(k, 0, len(self._table) - 1)
-        if j < len(self._table) and self._table[j]._key == k:
-            self._table[j]._value = v
+        j = self._find_index(k)
+        if j < len(self._keys) and self._keys[j] == k:
+            self._values[j] = v
         else:
-            self._table.insert(j, self._Item(k, v))
+            self._keys.insert(j, k)
+            self._values.insert(j, v)
     
     def __delitem__(self, k):
         """Remove item associated with key k (raise KeyError if not found)."""
-        j = self._find_index(k, 0, len(self._table) - 1)
-        if j == len(self._table) or self._table[j]._key != k:
+        j = self._find_index(k)
+        if j == len(self._keys) or self._keys[j] != k:
             raise KeyError('Key Error: ' + repr(k))
-        self._table.pop(j)
+        self._keys.pop(j)
+        self._values.pop(j)
     
     def __iter__(self):
         """Generate keys of the map ordered from minimum to maximum."""
-        for item in self._table:
-            yield item._key 
+        return iter(self._keys)
     
     def __reversed__(self):
         """Generate keys of the map ordered from maximum to minimum."""
-        for item in reversed(self._table):
-            yield item._key 
+        return reversed(self._keys)
+
+    def update_many(self, iterable, presorted=False):
+        """Assign each (key, value) pair of iterable with one sort and one merge.
+
+        The pairs are sorted (unless presorted is True) and merged with the
+        table in a single pass, rather than inserted one at a time.
+        """
+        batch = list(iterable)
+        if not presorted:
+            batch.sort(key=lambda pair: pair[0])    # stable: last duplicate stays last
+        old_keys, old_values = self._keys, self._values
+        keys, values = [], []
+        i = 0
+        for k, v in batch:
+            while i < len(old_keys) and old_keys[i] < k:
+                keys.append(old_keys[i])
+                values.append(old_values[i])
+                i += 1
+            if i < len(old_keys) and old_keys[i] == k:
+                i += 1                              # old item is replaced
+            if keys and keys[-1] == k:
+                values[-1] = v                      # repeated key in batch
+            else:
+                keys.append(k)
+                values.append(v)
+        keys.extend(old_keys[i:])
+        values.extend(old_values[i:])
+        self._keys, self._values = keys, values
+
+    def delete_many(self, keys):
+        """Remove items associated with keys with one sort and one pass over the table.
+        Return the number of items removed."""
+        doomed = sorted(keys)
+        kept_keys, kept_values = [], []
+        j = 0
+        for k, v in zip(self._keys, self._values):
+            while j < len(doomed) and doomed[j] < k:
+                j += 1
+            if j == len(doomed) or doomed[j] != k:
+                kept_keys.append(k)
+                kept_values.append(v)
+        count = len(self._keys) - len(kept_keys)
+        self._keys, self._values = kept_keys, kept_values
+        return count
 
     def find_min(self):
         """Return (key, value) pair with minimum key (or None if empty)."""
-        if len(self._table) > 0:
-            return (self._table[0]._key, self._table[0]._value)
+        if len(self._keys) > 0:
+            return self._item(0)
         else:
             return None
     
     def find_max(self):
         """Return (key, value) pair with maximum key (or None if empty)."""
-        if len(self._table) > 0:
-            return (self._table[-1]._key, self._table[-1]._value)
+        if len(self._keys) > 0:
+            return self._item(-1)
         else:
             return None
 
     def find_ge(self, k):
         """Return (key, value) pair with least key greater than or equal to k."""
-        j = self._find_index(k, 0, len(self._table) - 1)
-        if j < len(self._table):
-            return (self._table[j]._key, self._table[j]._value)
+        j = bisect_left(self._keys, k)
+        if j < len(self._keys):
+            return self._item(j)
         else:
             return None 
     
     def find_le(self, k):
         """Return (key, value) pair with greatest key less than or equal to k."""
-        j = self._find_index(k, 0, len(self._table) - 1)
-        if j < len(self._table) and self._table[j]._key == k:
-            return (self._table[j]._key, self._table[j]._value)
-        elif j > 0:
-            return (self._table[j-1]._key, self._table[j-1]._value)
+        j = bisect_right(self._keys, k)
+        if j > 0:
+            return self._item(j-1)
         else:
             return None 
     
     def find_lt(self, k):
         """Return (key, value) pair with greatest key strictly less than k."""
-        j = self._find_index(k, 0, len(self._table) - 1)
+        j = bisect_left(self._keys, k)
         if j > 0:
-            return (self._table[j-1]._key, self._table[j-1]._value)
+            return self._item(j-1)
         else:
             return None 
     
     def find_gt(self, k):
         """Return (key, value) pair with least key strictly greater than k."""
-        j = self._find_index(k, 0, len(self._table) - 1)
-        if j < len(self._table) and self._table[j]._key == k:
-            j += 1
-        if j < len(self._table):
-            return (self._table[j]._key, self._table[j]._value)
+        j = bisect_right(self._keys, k)
+        if j < len(self._keys):
+            return self._item(j)
         else:
             return None 
     
     def find_range(self, start, stop):
         """Iterate all (key, value) pairs such that start <= key < stop.
         
+        If start is None, iteration begins with minimum key of map.
+        If stop is None, iteration continues through the maximum key of map.
+        """
+        j = 0 if start is None else bisect_left(self._keys, start)
+        end = len(self._keys) if stop is None else bisect_left(self._keys, stop)
+        return zip(self._keys[j:end], self._values[j:end])
+
+    # persistence
+    def save(self, path, step=64):
+        """Write the map to an immutable sorted-table file at path (see SSTableMap)."""
+        SSTableMap.write(path, zip(self._keys, self._values), step)
+
+    @classmethod
+    def load(cls, path):
+        """Create a map holding all items of the sorted-table file at path."""
+        with SSTableMap(path) as table:
+            return cls.from_items(table.find_range(None, None), presorted=True)
+
+
+class SSTableMap(MapBase):
+    """Immutable sorted map stored in a file and read through mmap.
+
+    The file (a sorted string table) is laid out as:
+        header      magic, n, step, offset of the offset index, offset of the sparse index
+        records     per item, in key order: key length, value length, pickled key and value
+        offsets     n fixed-width (8-byte) offsets of the records
+        sparse      pickled list of every step-th key
+
+    Only the sparse index is loaded when the file is opened. A search bisects
+    the sparse index in memory, and then about log(step) records of the file.
+    """
+    _MAGIC = b'SST1'
+    _HEADER = struct.Struct('<4sQIQQ')
+    _RECORD = struct.Struct('<II')
+    _OFFSET = struct.Struct('<Q')
+
+    @classmethod
+    def write(cls, path, items, step=64):
+        """Write the (key, value) pairs of items, given in increasing key order, to path."""
+        offsets = array('Q')
+        sparse = []
+        with open(path, 'wb') as f:
+            f.write(bytes(cls._HEADER.size))   # header is filled in at the end
+            for k, v in items:
+                if len(offsets) % step == 0:
+                    sparse.append(k)
+                kb, vb = pickle.dumps(k), pickle.dumps(v)
+                offsets.append(f.tell())
+                f.write(cls._RECORD.pack(len(kb), len(vb)))
+                f.write(kb)
+                f.write(vb)
+            index_pos = f.tell()
+            if sys.byteorder == 'big':
+                offsets.byteswap()      # offsets are stored little-endian
+            f.write(offsets.tobytes())
+            sparse_pos = f.tell()
+            f.write(pickle.dumps(sparse))
+            f.seek(0)
+            f.write(cls._HEADER.pack(cls._MAGIC, len(offsets), step, index_pos, sparse_pos))
+
+    def __init__(self, path):
+        """Open the sorted-table file at path."""
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._n, self._step, self._index_pos, sparse_pos = self._HEADER.unpack_from(self._mm, 0)
+        if magic != self._MAGIC:
+            self.close()
+            raise ValueError('Not a sorted-table file: ' + repr(path))
+        self._sparse = pickle.loads(self._mm[sparse_pos:])
+
+    def close(self):
+        """Release the file."""
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # nonpublic behaviours
+    def _record(self, j):
+        """Return (offset, key length, value length) of the record at index j."""
+        offset = self._OFFSET.unpack_from(self._mm, self._index_pos + 8 * j)[0]
+        klen, vlen = self._RECORD.unpack_from(self._mm, offset)
+        return offset + self._RECORD.size, klen, vlen
+
+    def _key(self, j):
+        start, klen, _ = self._record(j)
+        return pickle.loads(self._mm[start:start + klen])
+
+    def _item(self, j):
+        """Return (key, value) pair at index j."""
+        start, klen, vlen = self._record(j)
+        return (pickle.loads(self._mm[start:start + klen]),
+                pickle.loads(self._mm[start + klen:start + klen + vlen]))
+
+    def _find_index(self, k, right=False):
+        """Return index of the leftmost item with key greater than or equal to k
+        (strictly greater if right is True), or n if no such item qualifies."""
+        if right:
+            i = bisect_right(self._sparse, k)
+        else:
+            i = bisect_left(self._sparse, k)
+        # the answer lies between the sparse keys at i-1 (excluded) and i (included)
+        low = (i - 1) * self._step + 1 if i > 0 else 0
+        high = min(i * self._step, self._n)
+        while low < high:
+            mid = (low + high) // 2
+            key = self._key(mid)
+            if key < k or (right and key == k):
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    # public behaviours
+    def __len__(self):
+        """Return number of items in the map."""
+        return self._n
+
+    def __getitem__(self, k):
+        """Return value associated with key k (raise KeyError if not found)."""
+        j = self._find_index(k)
+        if j < self._n:
+            key, value = self._item(j)
+            if key == k:
+                return value
+        raise KeyError('Key Error: ' + repr(k))
+
+    def __setitem__(self, k, v):
+        raise TypeError('SSTableMap is immutable')
+
+    def __delitem__(self, k):
+        raise TypeError('SSTableMap is immutable')
+
+    def __iter__(self):
+        """Generate keys of the map ordered from minimum to maximum."""
+        for j in range(self._n):
+            yield self._key(j)
+
+    def find_min(self):
+        """Return (key, value) pair with minimum key (or None if empty)."""
+        return self._item(0) if self._n > 0 else None
+
+    def find_max(self):
+        """Return (key, value) pair with maximum key (or None if empty)."""
+        return self._item(self._n - 1) if self._n > 0 else None
+
+    def find_ge(self, k):
+        """Return (key, value) pair with least key greater than or equal to k."""
+        j = self._find_index(k)
+        return self._item(j) if j < self._n else None
+
+    def find_le(self, k):
+        """Return (key, value) pair with greatest key less than or equal to k."""
+        j = self._find_index(k, right=True)
+        return self._item(j-1) if j > 0 else None
+
+    def find_lt(self, k):
+        """Return (key, value) pair with greatest key strictly less than k."""
+        j = self._find_index(k)
+        return self._item(j-1) if j > 0 else None
+
+    def find_gt(self, k):
+        """Return (key, value) pair with least key strictly greater than k."""
+        j = self._find_index(k, right=True)
+        return self._item(j) if j < self._n else None
+
+    def find_range(self, start, stop):
+        """Iterate all (key, value) pairs such that start <= key < stop.
+
+        If start is None, iteration begins with minimum key of map.
+        If stop is None, iteration continues through the maximum key of map.
+        """
+        j = 0 if start is None else self._find_index(start)
+        end = self._n if stop is None else self._find_index(stop)
+        for i in range(j, end):
+            yield self._item(i)
+
+
+class SkipListMap(MapBase):
+    """Sorted map implementation using a skip list.
+
+    Searches and updates take expected O(log n) time. A single writer may run
+    alongside any number of readers without locks: a new node is fully built
+    before it is linked in from the bottom level up, and a removed node is
+    unlinked from the top level down but keeps its own links, so a reader
+    standing on it can still move forward.
+    """
+    _MAX_LEVEL = 32
+
+    # nested _Node class
+    class _Node:
+        """Lightweight, nonpublic class for storing a skip list node."""
+        __slots__ = '_key', '_value', '_next'   # _next[i] is the next node at level i
+
+        def __init__(self, k, v, level):
+            self._key = k
+            self._value = v
+            self._next = level * [None]
+
+    # nonpublic behaviours
+    def _random_level(self):
+        """Return level for a new node: level i is reached with probability p**(i-1)."""
+        level = 1
+        while level < self._MAX_LEVEL and random() < self._p:
+            level += 1
+        return level
+
+    def _find_lt_node(self, k):
+        """Return last node with key strictly less than k (the head if none)."""
+        node = self._head
+        for i in range(self._level - 1, -1, -1):
+            nxt = node._next[i]
+            while nxt is not None and nxt._key < k:
+                node = nxt
+                nxt = node._next[i]
+        return node
+
+    def _find_le_node(self, k):
+        """Return last node with key less than or equal to k (the head if none)."""
+        node = self._head
+        for i in range(self._level - 1, -1, -1):
+            nxt = node._next[i]
+            while nxt is not None and not k < nxt._key:
+                node = nxt
+                nxt = node._next[i]
+        return node
+
+    def _find_path(self, k):
+        """Return list whose entry i is the last node at level i with key less than k."""
+        update = self._MAX_LEVEL * [self._head]
+        node = self._head
+        for i in range(self._level - 1, -1, -1):
+            nxt = node._next[i]
+            while nxt is not None and nxt._key < k:
+                node = nxt
+                nxt = node._next[i]
+            update[i] = node
+        return update
+
+    def _pair(self, node):
+        """Return (key, value) pair of node (None for the head or None)."""
+        if node is None or node is self._head:
+            return None
+        return (node._key, node._value)
+
+    # public behaviours
+    def __init__(self, p=0.5):
+        """Create an empty map."""
+        self._head = self._Node(None, None, self._MAX_LEVEL)
+        self._level = 1     # number of levels in use
+        self._n = 0
+        self._p = p
+
+    def __len__(self):
+        """Return number of items in the map."""
+        return self._n
+
+    def __getitem__(self, k):
+        """Return value associated with key k (raise KeyError if not found)."""
+        node = self._find_lt_node(k)._next[0]
+        if node is None or node._key != k:
+            raise KeyError('Key Error: ' + repr(k))
+        return node._value
+
+    def __setitem__(self, k, v):
+        """Assign value v to key k, overwriting existing value if present."""
+        update = self._find_path(k)
+        node = update[0]._next[0]
+        if node is not None and node._key == k:
+            node._value = v
+            return
+        level = self._random_level()
+        newest = self._Node(k, v, level)
+        for i in range(level):
+            newest._next[i] = update[i]._next[i]
+        for i in range(level):          # publish bottom-up
+            update[i]._next[i] = newest
+        if level > self._level:
+            self._level = level
+        self._n += 1
+
+    def __delitem__(self, k):
+        """Remove item associated with key k (raise KeyError if not found)."""
+        update = self._find_path(k)
+        node = update[0]._next[0]
+        if node is None or node._key != k:
+            raise KeyError('Key Error: ' + repr(k))
+        for i in range(len(node._next) - 1, -1, -1):    # unlink top-down
+            update[i]._next[i] = node._next[i]
+        while self._level > 1 and self._head._next[self._level - 1] is None:
+            self._level -= 1
+        self._n -= 1
+
+    def __iter__(self):
+        """Generate keys of the map ordered from minimum to maximum."""
+        node = self._head._next[0]
+        while node is not None:
+            yield node._key
+            node = node._next[0]
+
+    def find_min(self):
+        """Return (key, value) pair with minimum key (or None if empty)."""
+        return self._pair(self._head._next[0])
+
+    def find_max(self):
+        """Return (key, value) pair with maximum key (or None if empty)."""
+        node = self._head
+        for i in range(self._level - 1, -1, -1):
+            while node._next[i] is not None:
+                node = node._next[i]
+        return self._pair(node)
+
+    def find_ge(self, k):
+        """Return (key, value) pair with least key greater than or equal to k."""
+        return self._pair(self._find_lt_node(k)._next[0])
+
+    def find_le(self, k):
+        """Return (key, value) pair with greatest key less than or equal to k."""
+        return self._pair(self._find_le_node(k))
+
+    def find_lt(self, k):
+        """Return (key, value) pair with greatest key strictly less than k."""
+        return self._pair(self._find_lt_node(k))
+
+    def find_gt(self, k):
+        """Return (key, value) pair with least key strictly greater than k."""
+        return self._pair(self._find_le_node(k)._next[0])
+
+    def find_range(self, start, stop):
+        """Iterate all (key, value) pairs such that start <= key < stop.
+
         If start is None, iteration begins with minimum key of map.
         If stop is None, iteration continues through the maximum key of map.
         """
         if start is None:
-            j = 0
+            node = self._head._next[0]
         else:
-            j = self._find_index(start, 0, len(self._table) - 1)
-        while j < len(self._table) and (stop is None or self._table[j]._key < stop):
-            yield (self._table[j]._key, self._table[j]._value)
-            j += 1
+            node = self._find_lt_node(start)._next[0]
+        while node is not None and (stop is None or node._key < stop):
+            yield (node._key, node._value)
+            node = node._next[0]
 
 
 class CostPerformanceDatabase:
-    """Maintain a database of maximal (cost, performance) pairs."""
+    """Maintain a database of maximal (cost, performance) pairs.
+
+    The pairs are kept in a SkipListMap, so removing dominated pairs costs
+    O(log n) each instead of shifting a sorted table.
+    """
 
     def __init__(self):
         """Create an empty database."""
-        self._M = SortedTableMap()
+        self._M = SkipListMap()
     
     def best(self, c):
         """Return (cost, performance) pair with largest cost not exceeding c.
         Return None if there is no such pair."""
         return self._M.find_le(c)
+
+    def best_many(self, costs):
+        """Return list of the best(c) answers for each cost c of costs.
+
+        A large batch is answered in one sweep of the database in cost order.
+        """
+        costs = list(costs)
+        n = len(self._M)
+        if len(costs) * n.bit_length() < n:     # few queries: search for each
+            return [self.best(c) for c in costs]
+        answers = len(costs) * [None]
+        order = sorted(range(len(costs)), key=costs.__getitem__)
+        pairs = self._M.find_range(None, None)
+        best = None
+        nxt = next(pairs, None)
+        for j in order:
+            while nxt is not None and not costs[j] < nxt[0]:
+                best = nxt
+                nxt = next(pairs, None)
+            answers[j] = best
+        return answers
     
     def add(self, c, p):
         """Add new entry with cost c and performance p."""
@@ -337,6 +1318,21 @@ class CostPerformanceDatabase:
             del self._M[other[0]]
             other = self._M.find_gt(c)
 
+    def add_many(self, pairs):
+        """Add each (cost, performance) pair of pairs.
+
+        Pairs are added in order of cost, and those dominated by a cheaper
+        pair of the batch are dropped before touching the database.
+        """
+        frontier = []
+        for c, p in sorted(pairs):
+            if frontier and frontier[-1][0] == c:
+                frontier.pop()          # same cost, at least as much performance
+            if not frontier or not p < frontier[-1][1]:
+                frontier.append((c, p))
+        for c, p in frontier:
+            self.add(c, p)
+
 
 class MultiMap:
     """A multimap class built upon use of an underlying map for storage."""
@@ -0,0 +1,426 @@
+from array import array
+from math import ceil, e, log, log2
+from random import Random
+
+from Chapter9.priority_queue import AdaptableHeapPriorityQueue
+from Chapter10.map import MapBase
+
+class SketchBase:
+    """Abstract base class for a sketch hashing keys with MAD functions.
+
+    Hash function i maps key k to ((hash(k) * a_i + b_i) mod p), as in
+    HashMapBase, with p the Mersenne prime 2^61 - 1 so that hash values
+    have enough bits. Sketches can only be merged if drawn with the same
+    seed, and their keys must hash alike in every process (for strings,
+    set PYTHONHASHSEED).
+    """
+    _PRIME = (1 << 61) - 1
+
+    def __init__(self, d, seed=None):
+        """Draw d MAD hash functions from seed (random if None)."""
+        rng = Random(seed)
+        self._scales = [1 + rng.randrange(self._PRIME-1) for _ in range(d)]
+        self._shifts = [rng.randrange(self._PRIME) for _ in range(d)]
+
+    def _hash_function(self, h, i=0):
+        """Return hash function i applied to key hash h."""
+        return (h * self._scales[i] + self._shifts[i]) % self._PRIME
+
+    def _check_mergeable(self, other):
+        if type(other) is not type(self) or self._params() != other._params():
+            raise ValueError('Sketches have different parameters')
+
+    def _params(self):
+        return (self._scales, self._shifts)
+
+
+class CountMinSketch(SketchBase):
+    """Count-Min sketch estimating the total count added for each key.
+
+    With width w = ceil(e / epsilon) and depth d = ceil(ln(1 / delta)), an
+    estimate is never below the true count, and exceeds it by more than
+    epsilon * total() with probability at most delta.
+    """
+
+    def __init__(self, epsilon=0.001, delta=0.01, seed=None):
+        """Create an empty sketch."""
+        self._width = ceil(e / epsilon)
+        depth = ceil(log(1 / delta))
+        super().__init__(depth, seed)
+        self._rows = [array('q', bytes(8 * self._width)) for _ in range(depth)]
+        self._total = 0
+
+    def _params(self):
+        return (self._width, self._scales, self._shifts)
+
+    def add(self, k, count=1):
+        """Add count occurrences of key k."""
+        h = hash(k)
+        w = self._width
+        for i, row in enumerate(self._rows):
+            row[self._hash_function(h, i) % w] += count
+        self._total += count
+
+    def estimate(self, k):
+        """Return estimated count of key k."""
+        h = hash(k)
+        w = self._width
+        return min(row[self._hash_function(h, i) % w] for i, row in enumerate(self._rows))
+
+    __getitem__ = estimate
+
+    def total(self):
+        """Return total count added to the sketch."""
+        return self._total
+
+    def merge(self, other):
+        """Add the counts of sketch other (drawn with the same seed) to this one."""
+        self._check_mergeable(other)
+        for row, other_row in zip(self._rows, other._rows):
+            for j in range(self._width):
+                row[j] += other_row[j]
+        self._total += other._total
+        return self
+
+
+class SpaceSaving:
+    """Space-Saving summary of the k most frequent keys of a stream.
+
+    At most k counters are kept, in an adaptable heap ordered by count. A
+    new key takes over the counter with minimum count m, which it inherits
+    as its error: its count is overestimated by at most that error. Any key
+    counted more than total() / k times is guaranteed to be tracked.
+    """
+
+    def __init__(self, k):
+        """Create an empty summary tracking up to k keys."""
+        if k < 1:
+            raise ValueError('k must be positive')
+        self._k = k
+        self._heap = AdaptableHeapPriorityQueue()   # locators (count, [key, error])
+        self._counters = {}                         # key -> locator
+        self._total = 0
+
+    def _min_count(self):
+        """Return the largest count an untracked key may have (0 unless all counters are used)."""
+        return self._heap.min()[0] if len(self._counters) == self._k else 0
+
+    def add(self, x, count=1):
+        """Add count occurrences of key x."""
+        self._total += count
+        loc = self._counters.get(x)
+        if loc is not None:
+            self._heap.update(loc, loc._key + count, loc._value)
+        elif len(self._counters) < self._k:
+            self._counters[x] = self._heap.add(count, [x, 0])
+        else:
+            m, (old, _) = self._heap.min()
+            loc = self._counters.pop(old)
+            self._heap.update(loc, m + count, [x, m])
+            self._counters[x] = loc
+
+    def estimate(self, x):
+        """Return an upper bound on the count of key x."""
+        loc = self._counters.get(x)
+        return loc._key if loc is not None else self._min_count()
+
+    def top(self, n=None):
+        """Return list of (key, count, error) triples for the n most frequent keys (all if None)."""
+        result = sorted(((loc._value[0], loc._key, loc._value[1]) for loc in self._counters.values()),
+                        key=lambda t: t[1], reverse=True)
+        return result if n is None else result[:n]
+
+    def total(self):
+        """Return total count added to the summary."""
+        return self._total
+
+    def merge(self, other):
+        """Combine the counts of summary other into this one, keeping the top k keys."""
+        m1, m2 = self._min_count(), other._min_count()
+        merged = []
+        for x in set(self._counters) | set(other._counters):
+            loc1, loc2 = self._counters.get(x), other._counters.get(x)
+            count = (loc1._key if loc1 else m1) + (loc2._key if loc2 else m2)
+            error = (loc1._value[1] if loc1 else m1) + (loc2._value[1] if loc2 else m2)
+            merged.append((count, x, error))
+        merged.sort(key=lambda t: t[0], reverse=True)
+        self._heap = AdaptableHeapPriorityQueue()
+        self._counters = {}
+        for count, x, error in merged[:self._k]:
+            self._counters[x] = self._heap.add(count, [x, error])
+        self._total += other._total
+        return self
+
+
+class HyperLogLog(SketchBase):
+    """HyperLogLog estimate of the number of distinct keys added.
+
+    Uses 2^b one-byte registers; the standard error is about 1.04 / sqrt(2^b).
+    A single MAD function keeps consecutive integers evenly spaced, which
+    skews the leading-zero counts, so two are composed with an xor-shift.
+    """
+    _BITS = 61          # bits of a hash value
+
+    def __init__(self, b=14, seed=None):
+        """Create an empty estimator with 2^b registers (4 <= b <= 16)."""
+        if not 4 <= b <= 16:
+            raise ValueError('b must be between 4 and 16')
+        super().__init__(2, seed)
+        self._b = b
+        self._registers = bytearray(1 << b)
+
+    def _params(self):
+        return (self._b, self._scales, self._shifts)
+
+    def _mix(self, k):
+        x = self._hash_function(hash(k), 0)
+        return self._hash_function(x ^ (x >> 29), 1)
+
+    def add(self, k):
+        """Add key k."""
+        x = self._mix(k)
+        j = x & ((1 << self._b) - 1)        # low b bits select the register
+        w = x >> self._b
+        rank = self._BITS - self._b - w.bit_length() + 1    # position of leftmost 1-bit
+        if rank > self._registers[j]:
+            self._registers[j] = rank
+
+    def estimate(self):
+        """Return estimated number of distinct keys added."""
+        m = len(self._registers)
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        raw = alpha * m * m / sum(2.0 ** -r for r in self._registers)
+        zeros = self._registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            return round(m * log(m / zeros))    # small range: linear counting
+        return round(raw)
+
+    __len__ = estimate
+
+    def merge(self, other):
+        """Combine sketch other (drawn with the same seed) into this one."""
+        self._check_mergeable(other)
+        self._registers = bytearray(map(max, self._registers, other._registers))
+        return self
+
+
+class BloomFilter(SketchBase):
+    """Bloom filter: set membership with false positives but no false negatives.
+
+    Sized for capacity keys at false-positive rate fp_rate, with m bits and
+    k probes derived from two MAD functions as h1 + i * h2 (mod m).
+    Keys cannot be removed.
+    """
+
+    def __init__(self, capacity, fp_rate=0.01, seed=None):
+        """Create an empty filter."""
+        if capacity < 1 or not 0 < fp_rate < 1:
+            raise ValueError('capacity must be positive and fp_rate in (0, 1)')
+        super().__init__(2, seed)
+        self._m = max(8, ceil(-capacity * log(fp_rate) / log(2) ** 2))
+        self._k = max(1, round(self._m / capacity * log(2)))
+        self._bits = bytearray((self._m + 7) // 8)
+
+    def _params(self):
+        return (self._m, self._k, self._scales, self._shifts)
+
+    def _probes(self, k):
+        """Generate the bit positions for key k."""
+        h = hash(k)
+        m = self._m
+        h1 = self._hash_function(h, 0) % m
+        h2 = self._hash_function(h, 1) % (m - 1) + 1    # nonzero step
+        for _ in range(self._k):
+            yield h1
+            h1 = (h1 + h2) % m
+
+    def add(self, k):
+        """Add key k."""
+        bits = self._bits
+        for j in self._probes(k):
+            bits[j >> 3] |= 1 << (j & 7)
+
+    def __contains__(self, k):
+        """Return False if key k was never added (True means probably added)."""
+        bits = self._bits
+        return all(bits[j >> 3] & (1 << (j & 7)) for j in self._probes(k))
+
+    def merge(self, other):
+        """Add the keys of filter other (built with the same parameters and seed) to this one."""
+        self._check_mergeable(other)
+        self._bits = bytearray(a | b for a, b in zip(self._bits, other._bits))
+        return self
+
+
+class CuckooFilter(SketchBase):
+    """Cuckoo filter: set membership with false positives, supporting removal.
+
+    Keeps a fingerprint of each key in one of its two candidate buckets of
+    bucket_size slots (partial-key cuckoo hashing: the buckets are i and
+    i xor hash(fingerprint)). Fingerprints have enough bits for fp_rate.
+    Only keys that were added may be discarded.
+    """
+    _MAX_KICKS = 500
+
+    def __init__(self, capacity, fp_rate=0.01, bucket_size=4, seed=None):
+        """Create an empty filter."""
+        if capacity < 1 or not 0 < fp_rate < 1:
+            raise ValueError('capacity must be positive and fp_rate in (0, 1)')
+        super().__init__(3, seed)
+        self._capacity = capacity
+        self._fp_rate = fp_rate
+        self._seed = seed
+        self._b = bucket_size
+        self._fbits = min(32, max(4, ceil(log2(2 * bucket_size / fp_rate))))
+        nb = 1
+        while nb * bucket_size * 0.95 < capacity:   # power of two, for the xor
+            nb *= 2
+        self._mask = nb - 1
+        self._slots = array('I', bytes(4 * nb * bucket_size))  # 0 marks an empty slot
+        self._victim = None     # (index, fingerprint) left homeless by a failed add
+        self._n = 0
+        self._rng = Random(seed)
+
+    def grown(self):
+        """Return an empty filter like this one with twice its capacity."""
+        return type(self)(2 * self._capacity, self._fp_rate, self._b, self._seed)
+
+    def _locate(self, k):
+        """Return (fingerprint, first bucket index) of key k."""
+        h = hash(k)
+        f = self._hash_function(h, 1) % ((1 << self._fbits) - 1) + 1
+        return f, self._hash_function(h, 0) & self._mask
+
+    def _alt(self, i, f):
+        """Return the other bucket index for fingerprint f stored in bucket i."""
+        return i ^ (self._hash_function(f, 2) & self._mask)
+
+    def _bucket_insert(self, i, f):
+        slots, b = self._slots, self._b
+        for s in range(i * b, (i + 1) * b):
+            if slots[s] == 0:
+                slots[s] = f
+                return True
+        return False
+
+    def _bucket_remove(self, i, f):
+        slots, b = self._slots, self._b
+        for s in range(i * b, (i + 1) * b):
+            if slots[s] == f:
+                slots[s] = 0
+                return True
+        return False
+
+    def _bucket_has(self, i, f):
+        b = self._b
+        return f in self._slots[i * b:(i + 1) * b]
+
+    def __len__(self):
+        """Return number of keys in the filter."""
+        return self._n
+
+    def add(self, k):
+        """Add key k (raise ValueError if the filter is full)."""
+        if self._victim is not None:
+            raise ValueError('Cuckoo filter is full')
+        f, i = self._locate(k)
+        self._n += 1
+        if self._bucket_insert(i, f) or self._bucket_insert(self._alt(i, f), f):
+            return
+        if self._rng.random() < 0.5:
+            i = self._alt(i, f)
+        for _ in range(self._MAX_KICKS):
+            s = i * self._b + self._rng.randrange(self._b)
+            f, self._slots[s] = self._slots[s], f       # evict a fingerprint
+            i = self._alt(i, f)
+            if self._bucket_insert(i, f):
+                return
+        self._victim = (i, f)   # keep it so that it is still found
+
+    def __contains__(self, k):
+        """Return False if key k is not in the filter (True means probably in it)."""
+        f, i = self._locate(k)
+        j = self._alt(i, f)
+        if self._victim is not None and self._victim[1] == f and self._victim[0] in (i, j):
+            return True
+        return self._bucket_has(i, f) or self._bucket_has(j, f)
+
+    def discard(self, k):
+        """Remove key k, which must have been added."""
+        f, i = self._locate(k)
+        j = self._alt(i, f)
+        if self._victim is not None and self._victim[1] == f and self._victim[0] in (i, j):
+            self._victim = None
+        elif not (self._bucket_remove(i, f) or self._bucket_remove(j, f)):
+            return
+        self._n -= 1
+        if self._victim is not None:    # room may have been made for it
+            vi, vf = self._victim
+            if self._bucket_insert(vi, vf) or self._bucket_insert(self._alt(vi, vf), vf):
+                self._victim = None
+
+
+class FilteredMap(MapBase):
+    """Map wrapper rejecting lookups of absent keys with a membership filter.
+
+    Wraps a map such as a SortedTableMap or ProbeHashMap, and keeps a
+    BloomFilter or CuckooFilter of its keys: a key the filter rules out is
+    reported missing without searching the map. Other methods (such as the
+    find_* queries of sorted maps) are passed on to the wrapped map.
+    Deleted keys are removed from filters that support discard; a Bloom
+    filter keeps them, which only costs extra searches. A full CuckooFilter
+    is replaced by one of twice its capacity.
+    """
+
+    def __init__(self, data, keyfilter):
+        """Wrap map data, adding its current keys to keyfilter."""
+        self._data = data
+        self._filter = keyfilter
+        for k in data:
+            keyfilter.add(k)
+
+    def __getattr__(self, name):
+        return getattr(self._data, name)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __contains__(self, k):
+        return k in self._filter and k in self._data
+
+    def __getitem__(self, k):
+        if k not in self._filter:
+            raise KeyError('Key Error: ' + repr(k))
+        return self._data[k]
+
+    def _add_key(self, k):
+        """Add key k to the filter, moving to ever larger filters while it is full."""
+        try:
+            self._filter.add(k)
+            return
+        except ValueError:              # a full CuckooFilter: rebuild a larger one
+            keyfilter = self._filter
+        while True:
+            keyfilter = keyfilter.grown()
+            try:
+                for key in self._data:
+                    keyfilter.add(key)
+                keyfilter.add(k)
+                break
+            except ValueError:
+                pass
+        self._filter = keyfilter
+
+    def __setitem__(self, k, v):
+        if k not in self._data:
+            self._add_key(k)
+        self._data[k] = v
+
+    def __delitem__(self, k):
+        del self._data[k]
+        discard = getattr(self._filter, 'discard', None)
+        if discard is not None:
+            discard(k)
@@ -0,0 +1,369 @@
+from bisect import bisect_left, bisect_right
+
+from Chapter10.map import MapBase
+
+class BTreeMap(MapBase):
+    """Sorted map implementation using a B+-tree of the given order.
+
+    Items are stored in leaves holding up to `order` keys in a sorted list,
+    with their values in a parallel list; the leaves are linked in key order
+    for scans. Internal nodes hold up to `order` children and the separating
+    keys between them. Nodes are searched with bisect, and every node but the
+    root is kept at least half full, so operations take O(log n) time while
+    visiting only O(log n / log order) nodes.
+    """
+
+    # nested node classes
+    class _Leaf:
+        """Lightweight, nonpublic class for storing a leaf."""
+        __slots__ = '_keys', '_values', '_prev', '_next'
+
+        def __init__(self, keys, values):
+            self._keys = keys
+            self._values = values
+            self._prev = None
+            self._next = None
+
+    class _Internal:
+        """Lightweight, nonpublic class for storing an internal node.
+
+        All keys of _children[i] are >= _keys[i-1] and < _keys[i].
+        """
+        __slots__ = '_keys', '_children'
+
+        def __init__(self, keys, children):
+            self._keys = keys
+            self._children = children
+
+    class Position:
+        """Location of an item, valid until the map is next modified."""
+
+        def __init__(self, container, leaf, j):
+            """Constructor should not be invoked by user."""
+            self._container = container
+            self._leaf = leaf
+            self._j = j
+
+        def key(self):
+            """Return key of map's key-value pair."""
+            return self._leaf._keys[self._j]
+
+        def value(self):
+            """Return value of map's key-value pair."""
+            return self._leaf._values[self._j]
+
+        def __eq__(self, other):
+            """Return True if other is a Position representing the same location."""
+            return type(other) is type(self) and other._leaf is self._leaf and other._j == self._j
+
+        def __ne__(self, other):
+            return not (self == other)
+
+    # nonpublic behaviours
+    def _make_position(self, leaf, j):
+        """Return Position of entry j of leaf, moving on to the next or previous
+        leaf when j is past either end (None if there is no such entry)."""
+        if j < 0:
+            leaf = leaf._prev
+            if leaf is None:
+                return None
+            j = len(leaf._keys) - 1
+        elif j >= len(leaf._keys):
+            leaf = leaf._next
+            if leaf is None:
+                return None
+            j = 0
+        return self.Position(self, leaf, j)
+
+    def _validate(self, p):
+        if not isinstance(p, self.Position):
+            raise TypeError('p must be proper Position type')
+        if p._container is not self:
+            raise ValueError('p does not belong to this container')
+        if not 0 <= p._j < len(p._leaf._keys):
+            raise ValueError('p is no longer valid')
+
+    def _find_path(self, k):
+        """Return (leaf that would hold key k, list of (internal node, child index) above it)."""
+        path = []
+        node = self._root
+        while isinstance(node, self._Internal):
+            i = bisect_right(node._keys, k)
+            path.append((node, i))
+            node = node._children[i]
+        return node, path
+
+    def _find_leaf(self, k):
+        """Return leaf that would hold key k."""
+        node = self._root
+        while isinstance(node, self._Internal):
+            node = node._children[bisect_right(node._keys, k)]
+        return node
+
+    def _pair(self, p):
+        return (p.key(), p.value()) if p is not None else None
+
+    def _split(self, node):
+        """Split an overfull node in two; return (separating key, new right node)."""
+        if isinstance(node, self._Leaf):
+            mid = len(node._keys) // 2
+            right = self._Leaf(node._keys[mid:], node._values[mid:])
+            del node._keys[mid:]
+            del node._values[mid:]
+            right._prev = node
+            right._next = node._next
+            if node._next is not None:
+                node._next._prev = right
+            else:
+                self._tail = right
+            node._next = right
+            return right._keys[0], right
+        mid = len(node._keys) // 2
+        sep = node._keys[mid]
+        right = self._Internal(node._keys[mid+1:], node._children[mid+1:])
+        del node._keys[mid:]
+        del node._children[mid+1:]
+        return sep, right
+
+    def _size(self, node):
+        return len(node._keys) if isinstance(node, self._Leaf) else len(node._children)
+
+    def _min_size(self, node):
+        return self._order // 2 if isinstance(node, self._Leaf) else (self._order + 1) // 2
+
+    def _borrow_left(self, parent, i):
+        """Move the last entry of child i-1 of parent into child i."""
+        left, node = parent._children[i-1], parent._children[i]
+        if isinstance(node, self._Leaf):
+            node._keys.insert(0, left._keys.pop())
+            node._values.insert(0, left._values.pop())
+            parent._keys[i-1] = node._keys[0]
+        else:
+            node._keys.insert(0, parent._keys[i-1])
+            node._children.insert(0, left._children.pop())
+            parent._keys[i-1] = left._keys.pop()
+
+    def _borrow_right(self, parent, i):
+        """Move the first entry of child i+1 of parent into child i."""
+        node, right = parent._children[i], parent._children[i+1]
+        if isinstance(node, self._Leaf):
+            node._keys.append(right._keys.pop(0))
+            node._values.append(right._values.pop(0))
+            parent._keys[i] = right._keys[0]
+        else:
+            node._keys.append(parent._keys[i])
+            node._children.append(right._children.pop(0))
+            parent._keys[i] = right._keys.pop(0)
+
+    def _merge(self, parent, i):
+        """Merge child i+1 of parent into child i."""
+        left, right = parent._children[i], parent._children[i+1]
+        if isinstance(left, self._Leaf):
+            left._keys += right._keys
+            left._values += right._values
+            left._next = right._next
+            if right._next is not None:
+                right._next._prev = left
+            else:
+                self._tail = left
+        else:
+            left._keys.append(parent._keys[i])
+            left._keys += right._keys
+            left._children += right._children
+        del parent._keys[i]
+        del parent._children[i+1]
+
+    # public behaviours
+    def __init__(self, order=64):
+        """Create an empty map whose nodes have up to order keys or children."""
+        if order < 3:
+            raise ValueError('order must be at least 3')
+        self._order = order
+        self._root = self._head = self._tail = self._Leaf([], [])
+        self._n = 0
+
+    def __len__(self):
+        """Return number of items in the map."""
+        return self._n
+
+    def __getitem__(self, k):
+        """Return value associated with key k (raise KeyError if not found)."""
+        leaf = self._find_leaf(k)
+        j = bisect_left(leaf._keys, k)
+        if j == len(leaf._keys) or leaf._keys[j] != k:
+            raise KeyError('Key Error: ' + repr(k))
+        return leaf._values[j]
+
+    def __setitem__(self, k, v):
+        """Assign value v to key k, overwriting existing value if present."""
+        leaf, path = self._find_path(k)
+        j = bisect_left(leaf._keys, k)
+        if j < len(leaf._keys) and leaf._keys[j] == k:
+            leaf._values[j] = v
+            return
+        leaf._keys.insert(j, k)
+        leaf._values.insert(j, v)
+        self._n += 1
+        node = leaf
+        while self._size(node) > self._order:
+            sep, right = self._split(node)
+            if not path:                    # root was split
+                self._root = self._Internal([sep], [node, right])
+                return
+            node, i = path.pop()
+            node._keys.insert(i, sep)
+            node._children.insert(i+1, right)
+
+    def __delitem__(self, k):
+        """Remove item associated with key k (raise KeyError if not found)."""
+        leaf, path = self._find_path(k)
+        j = bisect_left(leaf._keys, k)
+        if j == len(leaf._keys) or leaf._keys[j] != k:
+            raise KeyError('Key Error: ' + repr(k))
+        del leaf._keys[j]
+        del leaf._values[j]
+        self._n -= 1
+        node = leaf
+        while path and self._size(node) < self._min_size(node):
+            parent, i = path.pop()
+            if i > 0 and self._size(parent._children[i-1]) > self._min_size(node):
+                self._borrow_left(parent, i)
+                return
+            if i + 1 < len(parent._children) and self._size(parent._children[i+1]) > self._min_size(node):
+                self._borrow_right(parent, i)
+                return
+            self._merge(parent, i-1 if i > 0 else i)
+            node = parent
+        if isinstance(self._root, self._Internal) and len(self._root._children) == 1:
+            self._root = self._root._children[0]
+
+    def __iter__(self):
+        """Generate keys of the map ordered from minimum to maximum."""
+        leaf = self._head
+        while leaf is not None:
+            yield from leaf._keys
+            leaf = leaf._next
+
+    def __reversed__(self):
+        """Generate keys of the map ordered from maximum to minimum."""
+        leaf = self._tail
+        while leaf is not None:
+            yield from reversed(leaf._keys)
+            leaf = leaf._prev
+
+    def update_many(self, iterable, presorted=False):
+        """Assign each (key, value) pair of iterable, overwriting existing values.
+
+        Presorted pairs loaded into an empty map are packed into leaves
+        directly, and the levels above are built bottom-up in O(n) time.
+        """
+        if not presorted or self._n > 0:
+            super().update_many(iterable, presorted)
+            return
+        keys, values = [], []
+        for k, v in iterable:
+            if keys and keys[-1] == k:
+                values[-1] = v          # last value wins
+            else:
+                keys.append(k)
+                values.append(v)
+        if not keys:
+            return
+        order = self._order
+        count = -(-len(keys) // order)  # number of leaves, spread evenly
+        nodes = []
+        for c in range(count):
+            lo, hi = c * len(keys) // count, (c + 1) * len(keys) // count
+            leaf = self._Leaf(keys[lo:hi], values[lo:hi])
+            if nodes:
+                leaf._prev = nodes[-1]
+                nodes[-1]._next = leaf
+            nodes.append(leaf)
+        self._head, self._tail = nodes[0], nodes[-1]
+        lows = [leaf._keys[0] for leaf in nodes]    # least key below each node
+        while len(nodes) > 1:
+            count = -(-len(nodes) // order)
+            parents, parent_lows = [], []
+            for c in range(count):
+                lo, hi = c * len(nodes) // count, (c + 1) * len(nodes) // count
+                parents.append(self._Internal(lows[lo+1:hi], nodes[lo:hi]))
+                parent_lows.append(lows[lo])
+            nodes, lows = parents, parent_lows
+        self._root = nodes[0]
+        self._n = len(keys)
+
+    # positional behaviours
+    def first(self):
+        """Return the first Position in the map (or None if empty)."""
+        return self._make_position(self._head, 0)
+
+    def last(self):
+        """Return the last Position in the map (or None if empty)."""
+        return self._make_position(self._tail, len(self._tail._keys) - 1)
+
+    def before(self, p):
+        """Return the Position just before p in the natural order.
+        Return None if p is the first position."""
+        self._validate(p)
+        return self._make_position(p._leaf, p._j - 1)
+
+    def after(self, p):
+        """Return the Position just after p in the natural order.
+        Return None if p is the last position."""
+        self._validate(p)
+        return self._make_position(p._leaf, p._j + 1)
+
+    def find_position(self, k):
+        """Return position with key k, or else neighbour (or None if empty)."""
+        leaf = self._find_leaf(k)
+        p = self._make_position(leaf, bisect_left(leaf._keys, k))
+        return p if p is not None else self.last()
+
+    # sorted map queries
+    def find_min(self):
+        """Return (key, value) pair with minimum key (or None if empty)."""
+        return self._pair(self.first())
+
+    def find_max(self):
+        """Return (key, value) pair with maximum key (or None if empty)."""
+        return self._pair(self.last())
+
+    def find_ge(self, k):
+        """Return (key, value) pair with least key greater than or equal to k."""
+        leaf = self._find_leaf(k)
+        return self._pair(self._make_position(leaf, bisect_left(leaf._keys, k)))
+
+    def find_gt(self, k):
+        """Return (key, value) pair with least key strictly greater than k."""
+        leaf = self._find_leaf(k)
+        return self._pair(self._make_position(leaf, bisect_right(leaf._keys, k)))
+
+    def find_le(self, k):
+        """Return (key, value) pair with greatest key less than or equal to k."""
+        leaf = self._find_leaf(k)
+        return self._pair(self._make_position(leaf, bisect_right(leaf._keys, k) - 1))
+
+    def find_lt(self, k):
+        """Return (key, value) pair with greatest key strictly less than k."""
+        leaf = self._find_leaf(k)
+        return self._pair(self._make_position(leaf, bisect_left(leaf._keys, k) - 1))
+
+    def find_range(self, start, stop):
+        """Iterate all (key, value) pairs such that start <= key < stop.
+
+        If start is None, iteration begins with minimum key of map.
+        If stop is None, iteration continues through the maximum key of map.
+        """
+        if start is None:
+            leaf, j = self._head, 0
+        else:
+            leaf = self._find_leaf(start)
+            j = bisect_left(leaf._keys, start)
+        while leaf is not None:
+            keys, values = leaf._keys, leaf._values
+            hi = len(keys) if stop is None else bisect_left(keys, stop, j)
+            for i in range(j, hi):
+                yield (keys[i], values[i])
+            if hi < len(keys):
+                return
+            leaf, j = leaf._next, 0
@@ -1,8 +1,30 @@
+from math import ceil
+
 from Chapter8.tree import LinkedBinaryTree
 from Chapter10.map import MapBase
 
 class TreeMap(LinkedBinaryTree, MapBase):
-    """Sorted map implementation using a binary search tree."""
+    """Sorted map implementation using a binary search tree.
+
+    Each node records the size of its subtree, which supports order
+    statistics (rank, select, count_range, percentile) in O(height) time.
+
+    In the balanced subclasses, join and split take O(log n) time, and
+    union and intersection of maps of sizes m <= n take O(m log(n/m + 1)).
+    Elsewhere union and intersection go item by item, since the recursive
+    algorithm could run as deep as a degenerate tree.
+    """
+
+    _balanced = False   # True where joins keep the height O(log n)
+
+    # nested _Node class
+    class _Node(LinkedBinaryTree._Node):
+        """Node class for search trees maintains the size of its subtree."""
+        __slots__ = '_size'     # additional data member
+
+        def __init__(self, element, parent=None, left=None, right=None):
+            super().__init__(element, parent, left, right)
+            self._size = 1
 
     # override Position class
     class Position(LinkedBinaryTree.Position):
@@ -15,18 +37,65 @@ class TreeMap(LinkedBinaryTree, MapBase):
             return self.element()._value 
     
     # nonpublic utilities
-    def _subtree_search(self, p, k):
-        """Return Position of p's subtree having key k, or last node searched."""
-        if k == p.key():
-            return p
-        elif k < p.key():
-            if self.left(p) is not None:
-                return self._subtree_search(self.left(p), k)
-        else:
-            if self.right(p) is not None:
-                return self._subtree_search(self.right(p), k)
-        return p 
-    
+    def _node_search(self, k):
+        """Return node having key k, or last node searched (or None if empty).
+
+        Walks the nodes directly, without creating a Position for each.
+        """
+        node = self._root
+        last = None
+        while node is not None:
+            key = node._element._key
+            if k == key:
+                return node
+            last = node
+            node = node._left if k < key else node._right
+        return last
+    
+    def _inorder_nodes(self, start, stop):
+        """Generate nodes with start <= key < stop in increasing key order (None: unbounded).
+
+        Uses an explicit stack of the nodes whose left subtrees are being
+        visited, so each step takes O(1) amortized time.
+        """
+        stack = []
+        node = self._root
+        while node is not None:     # stack the path to the least key >= start
+            if start is None or not node._element._key < start:
+                stack.append(node)
+                node = node._left
+            else:
+                node = node._right
+        while stack:
+            node = stack.pop()
+            if stop is not None and not node._element._key < stop:
+                return
+            yield node
+            node = node._right
+            while node is not None:
+                stack.append(node)
+                node = node._left
+
+    def _reversed_nodes(self, start, stop):
+        """Generate nodes with start <= key < stop in decreasing key order (None: unbounded)."""
+        stack = []
+        node = self._root
+        while node is not None:     # stack the path to the greatest key < stop
+            if stop is None or node._element._key < stop:
+                stack.append(node)
+                node = node._right
+            else:
+                node = node._left
+        while stack:
+            node = stack.pop()
+            if start is not None and node._element._key < start:
+                return
+            yield node
+            node = node._left
+            while node is not None:
+                stack.append(node)
+                node = node._right
+
     def _subtree_first_position(self, p):
         """Return Position of first item in subtree rooted at p."""
         walk = p
@@ -80,12 +149,12 @@ class TreeMap(LinkedBinaryTree, MapBase):
 
     def find_position(self, k):
         """Return position with key k, or else neighbour (or None if empty)."""
-        if self.is_empty():
+        node = self._node_search(k)
+        if node is None:
             return None 
         else:
-            p = self._subtree_search(self.root(), k)
-            self._rebalance_access(p)
-            return p 
+            self._rebalance_access_node(node)
+            return self._make_position(node)
     
     def find_min(self):
         """Return (key, value) pair with minimum key (or None if empty)."""
@@ -95,6 +164,14 @@ class TreeMap(LinkedBinaryTree, MapBase):
             p = self.first()
             return (p.key(), p.value())
     
+    def find_max(self):
+        """Return (key, value) pair with maximum key (or None if empty)."""
+        if self.is_empty():
+            return None 
+        else:
+            p = self.last()
+            return (p.key(), p.value())
+
     def find_ge(self, k):
         """Return (key, value) pair with least key greater than or equal to k.
         Return None if there does not exist such a key."""
@@ -105,6 +182,39 @@ class TreeMap(LinkedBinaryTree, MapBase):
             if p.key() < k:
                 p = self.after(p)
             return (p.key(), p.value()) if p is not None else None
+
+    def find_gt(self, k):
+        """Return (key, value) pair with least key strictly greater than k.
+        Return None if there does not exist such a key."""
+        if self.is_empty():
+            return None 
+        else:
+            p = self.find_position(k)
+            if not k < p.key():
+                p = self.after(p)
+            return (p.key(), p.value()) if p is not None else None
+
+    def find_le(self, k):
+        """Return (key, value) pair with greatest key less than or equal to k.
+        Return None if there does not exist such a key."""
+        if self.is_empty():
+            return None 
+        else:
+            p = self.find_position(k)
+            if k < p.key():
+                p = self.before(p)
+            return (p.key(), p.value()) if p is not None else None
+
+    def find_lt(self, k):
+        """Return (key, value) pair with greatest key strictly less than k.
+        Return None if there does not exist such a key."""
+        if self.is_empty():
+            return None 
+        else:
+            p = self.find_position(k)
+            if not p.key() < k:
+                p = self.before(p)
+            return (p.key(), p.value()) if p is not None else None
     
     def find_range(self, start, stop):
         """Iterate all (key, value) pairs such that start <= key < stop.
@@ -112,52 +222,126 @@ class TreeMap(LinkedBinaryTree, MapBase):
         If start is None, iteration begins with minimum key of map.
         If stop is None, iteration continues through the maximum key of map.
         """
-        if not self.is_empty():
-            if start is None:
-                p = self.first()
+        for node in self._inorder_nodes(start, stop):
+            yield (node._element._key, node._element._value)
+
+    def find_range_reversed(self, start, stop):
+        """Iterate all (key, value) pairs such that start <= key < stop, in decreasing key order.
+
+        If start (or stop) is None, the range is unbounded below (or above).
+        """
+        for node in self._reversed_nodes(start, stop):
+            yield (node._element._key, node._element._value)
+
+    # order statistics
+    def rank(self, k):
+        """Return the number of keys strictly less than k."""
+        r = 0
+        node = self._root
+        while node is not None:
+            if not node._element._key < k:
+                node = node._left
             else:
-                p = self.find_position(start)
-                if p.key() < start:
-                    p = self.after(p)
-            while p is not None and (stop is None or p.key() < stop):
-                yield (p.key(), p.value())
-                p = self.after(p)
-    
+                r += self._subtree_size(node._left) + 1
+                node = node._right
+        return r
+
+    def select(self, i):
+        """Return (key, value) pair with the i-th smallest key (counting from 0).
+
+        Negative i counts from the largest key. Raise IndexError if out of range.
+        """
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('Index out of range')
+        node = self._root
+        while True:
+            left = self._subtree_size(node._left)
+            if i < left:
+                node = node._left
+            elif i == left:
+                return (node._element._key, node._element._value)
+            else:
+                i -= left + 1
+                node = node._right
+
+    def count_range(self, start, stop):
+        """Return the number of keys such that start <= key < stop.
+
+        If start (or stop) is None, the range is unbounded below (or above).
+        """
+        high = len(self) if stop is None else self.rank(stop)
+        low = 0 if start is None else self.rank(start)
+        return max(0, high - low)
+
+    def percentile(self, q):
+        """Return (key, value) pair at percentile q (0 <= q <= 100) of the keys.
+
+        Uses the nearest-rank method. Return None if the map is empty.
+        """
+        if not 0 <= q <= 100:
+            raise ValueError('q must be between 0 and 100')
+        if self.is_empty():
+            return None
+        return self.select(max(0, ceil(q * len(self) / 100) - 1))
+
     def __getitem__(self, k):
         """Return value associated with key k (raise KeyError if not found)."""
-        if self.is_empty():
+        node = self._node_search(k)
+        if node is None:
             raise KeyError('Key Error: ' + repr(k))
         else:
-            p = self._subtree_search(self.root(), k)
-            self._rebalance_access(p)
-            if k != p.key():
+            self._rebalance_access_node(node)
+            if k != node._element._key:
                 raise KeyError('Key Error: ' + repr(k))
-            return p.value()
+            return node._element._value
+
+    def get(self, k, default=None):
+        """Return value associated with key k (or default if not found)."""
+        node = self._node_search(k)
+        if node is None:
+            return default
+        self._rebalance_access_node(node)
+        return node._element._value if k == node._element._key else default
+
+    def __contains__(self, k):
+        """Return True if key k is in the map."""
+        node = self._node_search(k)
+        if node is None:
+            return False
+        self._rebalance_access_node(node)
+        return k == node._element._key
     
     def __setitem__(self, k, v):
         """Assign value v to key k, overwriting existing value if present."""
-        if self.is_empty():
+        node = self._node_search(k)
+        if node is None:
             leaf = self._add_root(self._Item(k, v))     # from LinkedBinaryTree
         else:
-            p = self._subtree_search(self.root(), k)
-            if p.key() == k:
-                p.element()._value = v 
-                self._rebalance_access(p)
+            if node._element._key == k:
+                node._element._value = v 
+                self._rebalance_access_node(node)
                 return 
             else:
+                p = self._make_position(node)
                 item = self._Item(k, v)
                 if p.key() < k:
                     leaf = self._add_right(p, item)     # inherited from LinkedBinaryTree
                 else:
                     leaf = self._add_left(p, item)
+        self._resize_path(leaf._node._parent, 1)
         self._rebalance_insert(leaf)
     
     def __iter__(self):
         """Generate an iteration of all keys in the map in order."""
-        p = self.first()
-        while p is not None:
-            yield p.key()
-            p = self.after(p)
+        for node in self._inorder_nodes(None, None):
+            yield node._element._key
+
+    def __reversed__(self):
+        """Generate an iteration of all keys in the map in reverse order."""
+        for node in self._reversed_nodes(None, None):
+            yield node._element._key
     
     def delete(self, p):
         """Remove the item at given Position."""
@@ -168,21 +352,122 @@ class TreeMap(LinkedBinaryTree, MapBase):
             p = replacement
         parent = self.parent(p)
         self._delete(p)
+        if parent is not None:
+            self._resize_path(parent._node, -1)
         self._rebalance_delete(parent)  # if root deleted, parent is None
     
     def __delitem__(self, k):
         """Remove item associated with key k (raise KeyError if not found)."""
-        if not self.is_empty():
-            p = self._subtree_search(self.root(), k)
-            if k == p.key():
-                self.delete(p)      # rely on positional version
+        node = self._node_search(k)
+        if node is not None:
+            if k == node._element._key:
+                self.delete(self._make_position(node))  # rely on positional version
                 return 
-            self._rebalance_access(p)
+            self._rebalance_access_node(node)
         raise KeyError('Key Error: ' + repr(k))
 
+    # bulk operations
+    @classmethod
+    def from_sorted(cls, items):
+        """Create a map from (key, value) pairs given in increasing key order, in O(n) time."""
+        return cls.from_items(items, presorted=True)
+
+    def update_many(self, iterable, presorted=False):
+        """Assign each (key, value) pair of iterable, overwriting existing values.
+
+        Presorted pairs loaded into an empty map are built directly into a
+        perfectly balanced tree in O(n) time.
+        """
+        if not presorted or not self.is_empty():
+            super().update_many(iterable, presorted)
+            return
+        items = []
+        for k, v in iterable:
+            if items and items[-1]._key == k:
+                items[-1]._value = v    # last value wins
+            else:
+                items.append(self._Item(k, v))
+        max_depth = len(items).bit_length() - 1
+        self._root = self._build(items, 0, len(items), None, 0, max_depth)
+        self._size = len(items)
+
+    def join(self, other):
+        """Move all items of map other, whose keys must all exceed those of self, into self.
+
+        Map other is left empty.
+        """
+        if type(other) is not type(self):
+            raise TypeError('Tree types must match')
+        if other.is_empty():
+            return
+        if not self.is_empty() and not self.last().key() < other.first().key():
+            raise ValueError('keys of other must exceed keys of self')
+        p = other.first()
+        item = p.element()
+        other.delete(p)         # its minimum item becomes the pivot
+        left, right = self._take_root(), other._take_root()
+        self._adopt(self._join(left, item, right, self._rank(left), self._rank(right))[0])
+
+    def split(self, k):
+        """Return two maps of the same type, holding the items with keys < k and >= k.
+
+        The map itself is left empty.
+        """
+        root = self._take_root()
+        left, _, item, right, rank = self._split_node(root, k, self._rank(root))
+        if item is not None:
+            right = self._join(None, item, right, 0, rank)[0]
+        low, high = type(self)(), type(self)()
+        low._adopt(left)
+        high._adopt(right)
+        return low, high
+
+    def union(self, other):
+        """Add the items of map other into self (values of other win on equal keys).
+
+        Map other is left empty.
+        """
+        if type(other) is not type(self):
+            raise TypeError('Tree types must match')
+        if not self._balanced:
+            for k, v in other.items():
+                self[k] = v
+            other._take_root()
+            return
+        a, b = self._take_root(), other._take_root()
+        self._adopt(self._union(a, b, self._rank(a), self._rank(b))[0])
+
+    def intersection(self, other):
+        """Keep only the items of self whose keys are also in map other.
+
+        Map other is left empty.
+        """
+        if type(other) is not type(self):
+            raise TypeError('Tree types must match')
+        if not self._balanced:
+            for k in [k for k in self if k not in other]:
+                del self[k]
+            other._take_root()
+            return
+        a, b = self._take_root(), other._take_root()
+        self._adopt(self._intersection(a, b, self._rank(a), self._rank(b))[0])
+
     def _rebalance_insert(self, p): pass 
     def _rebalance_delete(self, p): pass 
-    def _rebalance_access(self, p): pass 
+    def _rebalance_access_node(self, node): pass    # takes a node, as lookups never make Positions
+
+    # support for subtree sizes
+    def _subtree_size(self, node):
+        return node._size if node is not None else 0
+
+    def _recompute_size(self, node):
+        node._size = 1 + self._subtree_size(node._left) + self._subtree_size(node._right)
+
+    def _resize_path(self, node, delta):
+        """Add delta to the subtree size of node and of all its ancestors."""
+        while node is not None:
+            node._size += delta
+            node = node._parent
 
     def _relink(self, parent, child, make_left_child):
         """Relink parent node with child node (we allow child to be None)."""
@@ -210,6 +495,8 @@ class TreeMap(LinkedBinaryTree, MapBase):
         else:
             self._relink(y, x._left, False)
             self._relink(x, y, True)
+        self._recompute_size(y)     # y is now a child of x
+        self._recompute_size(x)
     
     def _restructure(self, x):
         """Perform trinode restructure of Position x with parent/grandparent."""
@@ -223,9 +510,142 @@ class TreeMap(LinkedBinaryTree, MapBase):
             self._rotate(x)
             return x            # x is new subtree root
 
+    # support for bulk operations
+    def _build(self, items, lo, hi, parent, depth, max_depth):
+        """Return root of a perfectly balanced subtree holding items[lo:hi]."""
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        node = self._Node(items[mid], parent)
+        node._left = self._build(items, lo, mid, node, depth + 1, max_depth)
+        node._right = self._build(items, mid + 1, hi, node, depth + 1, max_depth)
+        self._recompute_size(node)
+        self._init_built_node(node, depth, max_depth)
+        return node
+
+    def _init_built_node(self, node, depth, max_depth):
+        """Set balance data of a built node at given depth (leaves are at max_depth or above)."""
+        pass
+
+    def _take_root(self):
+        """Detach and return the root node of the tree (or None), leaving the map empty."""
+        root = self._root
+        self._root = None
+        self._size = 0
+        return root
+
+    def _adopt(self, root):
+        """Make the detached subtree at root (or None) the whole tree."""
+        self._root = root
+        self._size = self._subtree_size(root)
+
+    def _make_node(self, item, left, right):
+        """Return a new node storing item, with detached subtrees left and right as children."""
+        node = self._Node(item, None, left, right)
+        for child in (left, right):
+            if child is not None:
+                child._parent = node
+        self._recompute_size(node)
+        return node
+
+    def _detach(self, node):
+        """Return the children of node as detached subtrees, retiring node."""
+        left, right = node._left, node._right
+        for child in (left, right):
+            if child is not None:
+                child._parent = None
+        node._parent = node     # convention for deprecated nodes
+        return left, right
+
+    # a subtree's rank is the balance data _join needs (0 for an empty subtree);
+    # it is computed once per bulk operation and then passed down with each subtree
+    def _rank(self, node):
+        """Return rank of detached subtree at node (balanced subclasses override this)."""
+        return 0
+
+    def _child_ranks(self, node, rank):
+        """Return ranks of the left and right subtrees of node, whose rank is rank."""
+        return 0, 0
+
+    def _join(self, left, item, right, rank_left, rank_right):
+        """Return (root, rank) of a tree holding detached subtrees left and right,
+        of the given ranks, and between them item (balanced subclasses override this)."""
+        return self._make_node(item, left, right), 0
+
+    def _split_node(self, node, k, rank):
+        """Split detached subtree at node, of given rank, into (subtree of keys < k,
+        its rank, item with key k or None, subtree of keys > k, its rank).
+
+        The search path is walked down first, setting aside the subtree hanging
+        off each step, and the pieces are then joined bottom-up, so no recursion
+        is needed however deep the tree.
+        """
+        path = []       # (item, subtree set aside, its rank, True if on the right)
+        found = None
+        while node is not None:
+            item = node._element
+            rank_left, rank_right = self._child_ranks(node, rank)
+            left, right = self._detach(node)
+            if k == item._key:
+                found = item
+                break
+            elif k < item._key:
+                path.append((item, right, rank_right, True))
+                node, rank = left, rank_left
+            else:
+                path.append((item, left, rank_left, False))
+                node, rank = right, rank_right
+        if found is None:
+            left = right = None
+            rank_left = rank_right = 0
+        low, rank_low, high, rank_high = left, rank_left, right, rank_right
+        for item, other, rank, on_right in reversed(path):
+            if on_right:
+                high, rank_high = self._join(high, item, other, rank_high, rank)
+            else:
+                low, rank_low = self._join(other, item, low, rank, rank_low)
+        return low, rank_low, found, high, rank_high
+
+    def _join_pair(self, left, right, rank_left, rank_right):
+        """Return (root, rank) of a tree holding detached subtrees left and right,
+        all of whose keys are in order."""
+        if left is None:
+            return right, rank_right
+        last = left
+        while last._right is not None:
+            last = last._right
+        low, rank_low, item, _, _ = self._split_node(left, last._element._key, rank_left)
+        return self._join(low, item, right, rank_low, rank_right)
+
+    def _union(self, a, b, rank_a, rank_b):
+        if a is None:
+            return b, rank_b
+        if b is None:
+            return a, rank_a
+        item = b._element
+        rank_b_left, rank_b_right = self._child_ranks(b, rank_b)
+        b_left, b_right = self._detach(b)
+        low, rank_low, _, high, rank_high = self._split_node(a, item._key, rank_a)
+        left, rank_left = self._union(low, b_left, rank_low, rank_b_left)
+        right, rank_right = self._union(high, b_right, rank_high, rank_b_right)
+        return self._join(left, item, right, rank_left, rank_right)
+
+    def _intersection(self, a, b, rank_a, rank_b):
+        if a is None or b is None:
+            return None, 0
+        rank_b_left, rank_b_right = self._child_ranks(b, rank_b)
+        b_left, b_right = self._detach(b)
+        low, rank_low, found, high, rank_high = self._split_node(a, b._element._key, rank_a)
+        left, rank_left = self._intersection(low, b_left, rank_low, rank_b_left)
+        right, rank_right = self._intersection(high, b_right, rank_high, rank_b_right)
+        if found is not None:
+            return self._join(left, found, right, rank_left, rank_right)
+        return self._join_pair(left, right, rank_left, rank_right)
+
 
 class AVLTreeMap(TreeMap):
     """Sorted map implementation using an AVL tree."""
+    _balanced = True
 
     # nested _Node class
     class _Node(TreeMap._Node):
@@ -283,10 +703,91 @@ class AVLTreeMap(TreeMap):
     def _rebalance_delete(self, p):
         self._rebalance(p)
 
+    # support for bulk operations
+    def _height_of(self, node):
+        return node._height if node is not None else 0
+
+    def _rank(self, node):
+        return self._height_of(node)
+
+    def _child_ranks(self, node, rank):
+        return node.left_height(), node.right_height()
+
+    def _init_built_node(self, node, depth, max_depth):
+        node._height = 1 + max(node.left_height(), node.right_height())
+
+    def _make_node(self, item, left, right):
+        node = super()._make_node(item, left, right)
+        node._height = 1 + max(node.left_height(), node.right_height())
+        return node
+
+    def _join(self, left, item, right, hl, hr):
+        if abs(hl - hr) <= 1:
+            node = self._make_node(item, left, right)
+            return node, node._height
+        tall_left = hl > hr
+        short, h = (right, hr) if tall_left else (left, hl)
+        self._root = parent = left if tall_left else right
+        walk = parent._right if tall_left else parent._left
+        while self._height_of(walk) > h + 1:    # descend the spine facing the short tree
+            parent = walk
+            walk = walk._right if tall_left else walk._left
+        if walk is not None:
+            walk._parent = None
+        node = self._make_node(item, walk, short) if tall_left else self._make_node(item, short, walk)
+        self._relink(parent, node, not tall_left)
+        self._resize_path(parent, node._size - self._subtree_size(walk))
+        self._rebalance(self._make_position(parent))
+        return self._root, self._root._height
+
 
 class SplayTreeMap(TreeMap):
     """Sorted map implementaion using a splay tree."""
 
+    # lookups made during a scan (as by items()) splay the tree, which would
+    # invalidate a stack of ancestors, so scans follow parent links instead
+    def _successor(self, node):
+        if node._right is not None:
+            node = node._right
+            while node._left is not None:
+                node = node._left
+            return node
+        while node._parent is not None and node is node._parent._right:
+            node = node._parent
+        return node._parent
+
+    def _predecessor(self, node):
+        if node._left is not None:
+            node = node._left
+            while node._right is not None:
+                node = node._right
+            return node
+        while node._parent is not None and node is node._parent._left:
+            node = node._parent
+        return node._parent
+
+    def _inorder_nodes(self, start, stop):
+        node, walk = None, self._root
+        while walk is not None:     # find the least key >= start
+            if start is None or not walk._element._key < start:
+                node, walk = walk, walk._left
+            else:
+                walk = walk._right
+        while node is not None and (stop is None or node._element._key < stop):
+            yield node
+            node = self._successor(node)
+
+    def _reversed_nodes(self, start, stop):
+        node, walk = None, self._root
+        while walk is not None:     # find the greatest key < stop
+            if stop is None or walk._element._key < stop:
+                node, walk = walk, walk._right
+            else:
+                walk = walk._left
+        while node is not None and (start is None or not node._element._key < start):
+            yield node
+            node = self._predecessor(node)
+
     # splay operation
     def _splay(self, p):
         while p != self.root():
@@ -312,12 +813,13 @@ class SplayTreeMap(TreeMap):
         if p is not None:
             self._splay(p)
     
-    def _rebalance_access(self, p):
-        self._splay(p)
+    def _rebalance_access_node(self, node):
+        self._splay(self._make_position(node))
 
 
 class RedBlackTreeMap(TreeMap):
     """Sorted map implementation using a red-black tree."""
+    _balanced = True
     class _Node(TreeMap._Node):
         """Node class for red-black tree maintains bit that denotes colour."""
         __slots__ = '_red'       # surprise: we don't need 'black'
@@ -355,8 +857,11 @@ class RedBlackTreeMap(TreeMap):
         self._resolve_red(p)    # new node is always red
     
     def _resolve_red(self, p):
+        """Resolve a double red at p; return True if the root was blackened,
+        growing the black height of the tree."""
         if self.is_root(p):
             self._set_black(p)
+            return True
         else:
             parent = self.parent(p)
             if self._is_red(parent):
@@ -371,8 +876,62 @@ class RedBlackTreeMap(TreeMap):
                     self._set_red(grand)
                     self._set_black(self.left(grand))
                     self._set_black(self.right(grand))
-                    self._resolve_red(grand)
+                    return self._resolve_red(grand)
+        return False
     
+    # support for bulk operations
+    def _init_built_node(self, node, depth, max_depth):
+        node._red = 0 < depth == max_depth      # deepest level red, unless it is the root
+
+    def _adopt(self, root):
+        if root is not None:
+            root._red = False       # a piece left by a split may have a red root
+        super()._adopt(root)
+
+    def _rank(self, node):
+        """Return the black height of node: the number of black nodes on a path
+        from node down to None."""
+        count = 0
+        while node is not None:
+            if not node._red:
+                count += 1
+            node = node._left
+        return count
+
+    def _child_ranks(self, node, rank):
+        rank -= 0 if node._red else 1
+        return rank, rank
+
+    def _join(self, left, item, right, bl, br):
+        if left is not None and left._red:
+            left._red = False       # a root may always be made black
+            bl += 1
+        if right is not None and right._red:
+            right._red = False
+            br += 1
+        if bl == br:
+            node = self._make_node(item, left, right)
+            node._red = False
+            return node, bl + 1
+        tall_left = bl > br
+        short, b = (right, br) if tall_left else (left, bl)
+        self._root = parent = left if tall_left else right
+        count = max(bl, br) - 1                 # black height below parent (a black root)
+        walk = parent._right if tall_left else parent._left
+        while not (walk is None or (not walk._red and count == b)):
+            if not walk._red:
+                count -= 1
+            parent = walk
+            walk = walk._right if tall_left else walk._left
+        if walk is not None:
+            walk._parent = None
+        node = self._make_node(item, walk, short) if tall_left else self._make_node(item, short, walk)
+        node._red = True
+        self._relink(parent, node, not tall_left)
+        self._resize_path(parent, node._size - self._subtree_size(walk))
+        grew = self._resolve_red(self._make_position(node))
+        return self._root, max(bl, br) + (1 if grew else 0)
+
     # support for deletions
     def _rebalance_delete(self, p):
         if len(self) == 1:
@@ -108,7 +108,7 @@ class LinkedQueue:
             self._tail._next = old_head 
             old_head._next = None 
     
-    def concatenate(self, Q2: LinkedQueue):
+    def concatenate(self, Q2: 'LinkedQueue'):
         """Takes all elements of LinkedQueue Q2 and appends them to the end of the original queue. 
         The operation should run in O(1) time and should result in Q2 being an empty queue."""
         self._tail._next = Q2._head
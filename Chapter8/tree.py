@@ -87,10 +87,11 @@ class Tree:
     
     def _subtree_preorder(self, p):
         """Generate a preorder iteration of positions in subtree rooted at p."""
-        yield p                     # visit p before its subtrees
-        for c in self.children(p):  # for each child c 
-            for other in self._subtree_preorder(c):     # do preorder of c's subtree
-                yield other 
+        stack = [p]                 # positions still to visit, next one on top
+        while stack:
+            p = stack.pop()
+            yield p                 # visit p before its subtrees
+            stack.extend(reversed(list(self.children(p))))  # so first child is on top
     
     def postorder(self):
         """Generate a postorder iteration of positions in the tree."""
@@ -100,10 +101,14 @@ class Tree:
 
     def _subtree_postorder(self, p):
         """Generate a postorder iteration of positions in subtree rooted at p."""
-        for c in self.children(p):
-            for other in self._subtree_postorder(c):
-                yield other 
-        yield p         # visit p after its subtrees
+        stack = [(p, False)]        # (position, whether its subtrees were visited)
+        while stack:
+            p, done = stack.pop()
+            if done:
+                yield p             # visit p after its subtrees
+            else:
+                stack.append((p, True))
+                stack.extend((c, False) for c in reversed(list(self.children(p))))
     
     def breadthfirst(self):
         """Generate a breadth-first iteration of the positions of the tree."""
@@ -169,18 +174,20 @@ class BinaryTree(Tree):
     def inorder(self):
         """Generate an inorder iteration of positions in the tree."""
         if not self.is_empty():
-            for p in self._subtree_postorder(self.root()):
+            for p in self._subtree_inorder(self.root()):
                 yield p
     
     def _subtree_inorder(self, p):
         """Generate an inorder iteration of positions in subtree rooted at p."""
-        if self.left(p) is not None:    # if left child exists, traverse its subtree
-            for other in self._subtree_inorder(self.left(p)):
-                yield other 
-        yield p         # visits p between its subtrees
-        if self.right(p) is not None:
-            for other in self._subtree_inorder(self.right(p)):
-                yield other 
+        stack = []          # positions whose left subtrees are being visited
+        walk = p
+        while stack or walk is not None:
+            while walk is not None:     # descend to the leftmost unvisited position
+                stack.append(walk)
+                walk = self.left(walk)
+            walk = stack.pop()
+            yield walk      # visits walk between its subtrees
+            walk = self.right(walk)
     
     # override inherited version to make inorder the default
     def positions(self):
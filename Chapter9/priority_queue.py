@@ -117,7 +117,7 @@ class HeapPriorityQueue(PriorityQueueBase):
         return self._left(j) < len(self._data)
     
     def _has_right(self, j):
-        return self._right < len(self._data)
+        return self._right(j) < len(self._data)
     
     def _swap(self, i, j):
         """Swap the elements at indices i and j of array."""
@@ -146,7 +146,7 @@ class HeapPriorityQueue(PriorityQueueBase):
         """Create a new Priority Queue.
         
         By default, queue will be empty. If contents is given, it should be as an iterable sequence of (k, v) tuples specifying the initial contens."""
-        self._data = [ self._Item(k, v) for k, v in contents]   # empty by default
+        self._data = [ self._Item(k, v) for k, v in contents] if contents is not None else []  # empty by default
         if len(self._data) > 1:
             self._heapify()
     
@@ -1,11 +1,25 @@
-import sys 
+import os
+import struct
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from Chapter9.priority_queue import HeapPriorityQueue
+
+CHUNK_SIZE = 1 << 20        # bytes read from (or written to) disk at a time
+MAGIC = b'HUF1'             # identifies a file produced by compress()
+BLOCK_MAGIC = b'HUFB'       # identifies a block container produced by compress_blocks()
+BLOCK_SIZE = 1 << 24        # bytes of input per independently decodable block
+LOOKUP_BITS = 10            # width of the window decoded by one table lookup
+ADAPTIVE_MAGIC = b'HUFA'    # identifies a stream produced by compress_stream()
+EOF_LETTER = 256            # letter that marks the end of an adaptive stream
 
 class Letter:
     def __init__(self, letter, freq):
         self.letter = letter
         self.freq = freq
         self.bitstring = ""
-    
+
     def __repr__(self):
         return f"{self.letter}:{self.freq}"
 
@@ -13,65 +27,549 @@ class TreeNode:
     def __init__(self, freq, left, right):
         self.freq = freq
         self.left = left
-        self.right = right 
-    
-def parse_file(file_path):
+        self.right = right
+
+def count_bytes(file_path, chunk_size=CHUNK_SIZE):
     """
-    Read the file and build a dict of all letters and their frequencies, 
-    then convert the dict into a list of Letter.
+    Read the file in binary chunks and return a Counter of its byte values.
     """
-    chars = {}
-    with open(file_path) as f:
+    counts = Counter()
+    with open(file_path, 'rb') as f:
         while True:
-            c = f.read(1)
-            if not c:
+            chunk = f.read(chunk_size)
+            if not chunk:
                 break
-            chars[c] = chars[c] + 1 if c in chars.keys() else 1
-    return sorted([Letter(c, f) for c, f in chars.items()], key=lambda l: l.freq)
+            counts.update(chunk)
+    return counts
+
+def parse_file(file_path):
+    """
+    Read the file and build the frequencies of all its bytes,
+    then convert them into a list of Letter sorted by frequency.
+    """
+    return letters_from_counts(count_bytes(file_path))
+
+def letters_from_counts(counts):
+    """Convert a Counter of byte values into a list of Letter sorted by frequency."""
+    return sorted([Letter(b, f) for b, f in sorted(counts.items())], key=lambda l: l.freq)
 
 def build_tree(letters):
     """
-    Run through the list of Letters and build the min heap for the Huffman Tree.
+    Build the Huffman Tree by repeatedly merging the two least frequent subtrees
+    taken from a heap-based priority queue, and return its root (None if empty).
     """
-    while len(letters) > 1:
-        left = letters.pop(0)
-        right = letters.pop(0)
-        total_freq = left.freq + right.freq
-        node = TreeNode(total_freq, left, right)
-        letters.append(node)
-        letters.sort(key=lambda l: l.freq)
-    return letters 
+    pq = HeapPriorityQueue((le.freq, le) for le in letters)
+    while len(pq) > 1:
+        f1, left = pq.remove_min()
+        f2, right = pq.remove_min()
+        pq.add(f1 + f2, TreeNode(f1 + f2, left, right))
+    return pq.remove_min()[1] if not pq.is_empty() else None
 
 def traverse_tree(root, bitstring):
     """
-    Recursively traverse the Huffman Tree to set each Letter's bitstring, 
+    Recursively traverse the Huffman Tree to set each Letter's bitstring,
     and return the list of Letters.
     """
     if type(root) is Letter:
-        root.bitstring = bitstring
+        root.bitstring = bitstring or "0"   # a lone letter still needs one bit
         return [root]
     letters = []
     letters += traverse_tree(root.left, bitstring + "0")
     letters += traverse_tree(root.right, bitstring + "1")
     return letters
 
+def code_lengths(root):
+    """Return the list of (letter, code length) pairs given by the Huffman Tree."""
+    return [(le.letter, len(le.bitstring)) for le in traverse_tree(root, "")]
+
+def canonical_codes(lengths):
+    """
+    Assign canonical Huffman codes from a list of (letter, code length) pairs,
+    and return the list of Letters with their bitstrings set.
+
+    Letters are ordered by (length, letter) and given consecutive codes, so the
+    lengths alone are enough to rebuild the whole code.
+    """
+    letters = []
+    code = 0
+    prev_len = 0
+    for letter, length in sorted(lengths, key=lambda pair: (pair[1], pair[0])):
+        code <<= length - prev_len
+        le = Letter(letter, 0)
+        le.bitstring = format(code, f'0{length}b')
+        letters.append(le)
+        code += 1
+        prev_len = length
+    return letters
+
+def code_table(letters):
+    """
+    Build the code table once: a list indexed by byte value holding its bitstring
+    (None for bytes that never occur).
+    """
+    table = [None] * 256
+    for le in letters:
+        table[le.letter] = le.bitstring
+    return table
+
+def _pack_bits(bits):
+    """Split a bitstring into its whole bytes and the leftover (fewer than 8) bits."""
+    whole = len(bits) - len(bits) % 8
+    if whole == 0:
+        return b'', bits
+    return int(bits[:whole], 2).to_bytes(whole // 8, 'big'), bits[whole:]
+
+def encode(chunks, table):
+    """
+    Generate the packed bytes of the bitstream for an iterable of byte chunks,
+    padding the last byte with zeros.
+    """
+    pending = ""
+    for chunk in chunks:
+        data, pending = _pack_bits(pending + ''.join(map(table.__getitem__, chunk)))
+        yield data
+    if pending:
+        yield int(pending.ljust(8, "0"), 2).to_bytes(1, 'big')
+
+def decode_table(letters, k=LOOKUP_BITS):
+    """
+    Build the lookup table for decoding k bits at a time.
+
+    Entry i holds the (letter, length) pair of the code that prefixes the k-bit
+    window i, or None if the window starts with a code longer than k bits.
+    """
+    table = [None] * (1 << k)
+    for le in letters:
+        length = len(le.bitstring)
+        if length <= k:
+            span = 1 << (k - length)
+            start = int(le.bitstring, 2) << (k - length)
+            table[start:start + span] = [(le.letter, length)] * span
+    return table
+
+def _decode_long(buf, nbits, k, need, long_codes):
+    """Return (letter, length) for a code longer than k bits at the front of buf."""
+    for length in range(k + 1, need + 1):
+        code = (buf >> (nbits - length)) & ((1 << length) - 1)
+        letter = long_codes.get((length, code))
+        if letter is not None:
+            return letter, length
+    raise ValueError('Invalid Huffman code')
+
+def decode(chunks, lengths, total, k=LOOKUP_BITS):
+    """
+    Generate the decoded bytes of a canonical Huffman bitstream, given as an
+    iterable of byte chunks, stopping after total letters.
+
+    Each letter is found by looking up the next k bits in a table, so most
+    letters take a single table hit; only codes longer than k bits fall back
+    to a search over the longer code lengths.
+    """
+    if total == 0:
+        return
+    letters = canonical_codes(lengths)
+    table = decode_table(letters, k)
+    long_codes = {(len(le.bitstring), int(le.bitstring, 2)): le.letter
+                  for le in letters if len(le.bitstring) > k}
+    need = max(k, max(length for _, length in lengths))    # bits needed to decode any letter
+    mask = (1 << k) - 1
+    buf = nbits = 0
+    for chunk in chunks:
+        result = bytearray()
+        for byte in chunk:
+            buf = ((buf & ((1 << nbits) - 1)) << 8) | byte
+            nbits += 8
+            while nbits >= need:
+                entry = table[(buf >> (nbits - k)) & mask]
+                if entry is None:
+                    entry = _decode_long(buf, nbits, k, need, long_codes)
+                result.append(entry[0])
+                nbits -= entry[1]
+                total -= 1
+                if total == 0:
+                    yield bytes(result)
+                    return
+        yield bytes(result)
+    # drain the bits left in the buffer, padded with zeros so every window is full
+    result = bytearray()
+    buf <<= need
+    nbits += need
+    while total > 0:
+        if nbits <= need:
+            raise ValueError('Compressed data is truncated')
+        entry = table[(buf >> (nbits - k)) & mask]
+        if entry is None:
+            entry = _decode_long(buf, nbits, k, need, long_codes)
+        result.append(entry[0])
+        nbits -= entry[1]
+        total -= 1
+    yield bytes(result)
+
+def _read_chunks(f, chunk_size=CHUNK_SIZE):
+    """
+    Generate the remaining contents of the open file f in chunks of at most
+    chunk_size bytes, yielding whatever is available rather than blocking
+    on a pipe or socket until a full chunk has arrived.
+    """
+    read = getattr(f, 'read1', f.read)
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+def _read_range(file_path, offset, size, chunk_size=CHUNK_SIZE):
+    """Generate the size bytes of the file starting at offset, in chunks."""
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        while size > 0:
+            chunk = f.read(min(chunk_size, size))
+            if not chunk:
+                break
+            size -= len(chunk)
+            yield chunk
+
+def _write_header(f, total, lengths, magic=MAGIC):
+    """
+    Write the header: magic, number of encoded bytes, number of letters,
+    then each letter's byte value and canonical code length.
+    """
+    f.write(magic)
+    f.write(struct.pack('>QH', total, len(lengths)))
+    for letter, length in lengths:
+        f.write(struct.pack('>BB', letter, length))
+
+def _read_header(f, magic=MAGIC):
+    """Read the header written by _write_header and return (total, lengths)."""
+    if f.read(len(magic)) != magic:
+        raise ValueError('Not a Huffman compressed file')
+    total, n = struct.unpack('>QH', f.read(10))
+    return total, [struct.unpack('>BB', f.read(2)) for _ in range(n)]
+
+def compress(in_path, out_path, chunk_size=CHUNK_SIZE):
+    """
+    Compress the file at in_path into out_path.
+
+    The input is read twice in chunks: once to count byte frequencies, and once
+    to emit the packed bitstream using the code table.
+    """
+    letters = parse_file(in_path)
+    total = sum(le.freq for le in letters)
+    lengths = code_lengths(build_tree(letters)) if letters else []
+    with open(out_path, 'wb') as out:
+        _write_header(out, total, lengths)
+        if not letters:
+            return
+        table = code_table(canonical_codes(lengths))
+        with open(in_path, 'rb') as f:
+            for data in encode(_read_chunks(f, chunk_size), table):
+                out.write(data)
+
+def decompress(in_path, out_path, chunk_size=CHUNK_SIZE):
+    """
+    Decompress a file written by compress() into out_path, using the
+    table-driven decoder.
+    """
+    with open(in_path, 'rb') as f, open(out_path, 'wb') as out:
+        total, lengths = _read_header(f)
+        for data in decode(_read_chunks(f, chunk_size), lengths, total):
+            out.write(data)
+
+def _count_block(args):
+    """Return the Counter of byte values in one block of the input."""
+    file_path, offset, size = args
+    counts = Counter()
+    for chunk in _read_range(file_path, offset, size):
+        counts.update(chunk)
+    return counts
+
+def _encode_block(args):
+    """Return the packed bitstream of one block of the input."""
+    file_path, offset, size, lengths = args
+    table = code_table(canonical_codes(lengths))
+    return b''.join(encode(_read_range(file_path, offset, size), table))
+
+def _decode_block(args):
+    """Return the decoded contents of one block of a container."""
+    file_path, offset, csize, size, lengths = args
+    return b''.join(decode(_read_range(file_path, offset, csize), lengths, size))
+
+def _read_block_header(f):
+    """
+    Read the header and block index of a container written by compress_blocks().
+
+    Return (lengths, index) where index holds one (size, offset, compressed size)
+    tuple per block, with offsets measured from the start of the file.
+    """
+    _, lengths = _read_header(f, BLOCK_MAGIC)
+    n, = struct.unpack('>I', f.read(4))
+    entries = [struct.unpack('>QQ', f.read(16)) for _ in range(n)]
+    index = []
+    offset = f.tell()
+    for size, csize in entries:
+        index.append((size, offset, csize))
+        offset += csize
+    return lengths, index
+
+def compress_blocks(in_path, out_path, block_size=BLOCK_SIZE, max_workers=None):
+    """
+    Compress the file at in_path into a block container at out_path.
+
+    The input is split into blocks of block_size bytes whose frequencies are
+    counted, and which are then encoded, in parallel over a process pool.
+    All blocks share one code and each starts on a byte boundary, so any block
+    can be decoded on its own through the block index in the header.
+    """
+    total = os.path.getsize(in_path)
+    blocks = [(in_path, offset, min(block_size, total - offset))
+              for offset in range(0, total, block_size)]
+    with ProcessPoolExecutor(max_workers) as executor:
+        counts = Counter()
+        for block_counts in executor.map(_count_block, blocks):
+            counts.update(block_counts)     # merge per-block counts
+        letters = letters_from_counts(counts)
+        lengths = code_lengths(build_tree(letters)) if letters else []
+        with open(out_path, 'wb') as out:
+            _write_header(out, total, lengths, BLOCK_MAGIC)
+            out.write(struct.pack('>I', len(blocks)))
+            index_pos = out.tell()
+            out.write(bytes(16 * len(blocks)))     # index is filled in once blocks are encoded
+            sizes = []
+            for data in executor.map(_encode_block, [block + (lengths,) for block in blocks]):
+                out.write(data)
+                sizes.append(len(data))
+            out.seek(index_pos)
+            for (_, _, size), csize in zip(blocks, sizes):
+                out.write(struct.pack('>QQ', size, csize))
+
+def decompress_block(in_path, j):
+    """Return the decoded contents of block j of a container written by compress_blocks()."""
+    with open(in_path, 'rb') as f:
+        lengths, index = _read_block_header(f)
+    size, offset, csize = index[j]
+    return _decode_block((in_path, offset, csize, size, lengths))
+
+def decompress_blocks(in_path, out_path, max_workers=None):
+    """Decompress a container written by compress_blocks(), decoding blocks in parallel."""
+    with open(in_path, 'rb') as f:
+        lengths, index = _read_block_header(f)
+    jobs = [(in_path, offset, csize, size, lengths) for size, offset, csize in index]
+    with ProcessPoolExecutor(max_workers) as executor, open(out_path, 'wb') as out:
+        for data in executor.map(_decode_block, jobs):
+            out.write(data)
+
+class AdaptiveHuffman:
+    """
+    Huffman Tree for one-pass (FGK) adaptive coding.
+
+    Encoder and decoder start from the same tree, holding only the NYT
+    ("not yet transmitted") leaf, and update it after every letter, so no
+    frequency table has to be sent. A new letter is sent as the NYT code
+    followed by the letter in 9 raw bits.
+    """
+
+    class _Node:
+        """Lightweight, nonpublic class for storing a tree node."""
+        __slots__ = '_weight', '_letter', '_parent', '_left', '_right', '_order'
+
+        def __init__(self, weight, letter, parent, order):
+            self._weight = weight
+            self._letter = letter
+            self._parent = parent
+            self._left = None
+            self._right = None
+            self._order = order     # index in the list of nodes by weight
+
+    def __init__(self):
+        """Create the initial tree holding only the NYT leaf."""
+        self._nyt = self._Node(0, None, None, 0)
+        self._root = self._nyt
+        self._nodes = [self._nyt]   # nodes in nondecreasing order of weight
+        self._leaves = {}           # letter -> leaf node
+
+    def _code(self, node):
+        """Return the bitstring of the path from the root to node."""
+        bits = []
+        while node._parent is not None:
+            bits.append("0" if node is node._parent._left else "1")
+            node = node._parent
+        return ''.join(reversed(bits))
+
+    def _swap(self, a, b):
+        """Exchange the positions of nodes a and b in the tree and in the order."""
+        pa, pb = a._parent, b._parent
+        a_left = a is pa._left
+        b_left = b is pb._left
+        if a_left:
+            pa._left = b
+        else:
+            pa._right = b
+        if b_left:
+            pb._left = a
+        else:
+            pb._right = a
+        a._parent, b._parent = pb, pa
+        self._nodes[a._order], self._nodes[b._order] = b, a
+        a._order, b._order = b._order, a._order
+
+    def _leader(self, node):
+        """Return the highest ordered node with the same weight as node."""
+        j = node._order
+        while j + 1 < len(self._nodes) and self._nodes[j + 1]._weight == node._weight:
+            j += 1
+        return self._nodes[j]
+
+    def encode_letter(self, letter):
+        """Return the bitstring for letter, and update the tree."""
+        leaf = self._leaves.get(letter)
+        if leaf is not None:
+            bits = self._code(leaf)
+        else:
+            bits = self._code(self._nyt) + format(letter, '09b')
+        self.update(letter)
+        return bits
+
+    def update(self, letter):
+        """Count one more occurrence of letter, restoring the sibling property."""
+        node = self._leaves.get(letter)
+        if node is None:
+            # split NYT into a new NYT and a leaf for the letter
+            old = self._nyt
+            self._nyt = self._Node(0, None, old, 0)
+            leaf = self._Node(1, letter, old, 1)
+            old._left, old._right = self._nyt, leaf
+            self._nodes[0:0] = [self._nyt, leaf]
+            for j in range(2, len(self._nodes)):
+                self._nodes[j]._order = j
+            self._leaves[letter] = leaf
+            node = old
+        while node is not None:
+            leader = self._leader(node)
+            if leader is not node and leader is not node._parent:
+                self._swap(node, leader)
+            node._weight += 1
+            node = node._parent
+
+    def decode_bits(self, bits):
+        """
+        Generate the letters of an iterable of bits ("0"/"1"), updating the tree
+        after each one, and stop after EOF_LETTER. A None in bits marks the
+        end of the input available so far and is passed through as None.
+        """
+        node = self._root
+        raw = "" if node is self._nyt else None     # bits of a letter following NYT
+        for bit in bits:
+            if bit is None:
+                yield None
+                continue
+            if raw is not None:
+                raw += bit
+                if len(raw) < 9:
+                    continue
+                letter = int(raw, 2)
+                raw = None
+            else:
+                node = node._left if bit == "0" else node._right
+                if node is self._nyt:
+                    raw = ""
+                    continue
+                if node._left is not None:
+                    continue
+                letter = node._letter
+            if letter == EOF_LETTER:
+                return
+            self.update(letter)
+            yield letter
+            node = self._root
+        raise ValueError('Adaptive stream is truncated')
+
+def adaptive_encode(chunks):
+    """
+    Generate the packed bytes of an adaptive Huffman bitstream for an
+    iterable of byte chunks, in a single pass over the input.
+    """
+    tree = AdaptiveHuffman()
+    pending = ""
+    for chunk in chunks:
+        data, pending = _pack_bits(pending + ''.join(map(tree.encode_letter, chunk)))
+        yield data
+    data, pending = _pack_bits(pending + tree.encode_letter(EOF_LETTER))
+    yield data
+    if pending:
+        yield int(pending.ljust(8, "0"), 2).to_bytes(1, 'big')
+
+def _bits(chunks):
+    """Generate the bits ("0"/"1") of an iterable of byte chunks, then None after each chunk."""
+    for chunk in chunks:
+        if chunk:
+            yield from bin(int.from_bytes(chunk, 'big'))[2:].zfill(8 * len(chunk))
+        yield None
+
+def adaptive_decode(chunks):
+    """Generate the decoded bytes of an adaptive Huffman bitstream, one chunk at a time."""
+    tree = AdaptiveHuffman()
+    result = bytearray()
+    for letter in tree.decode_bits(_bits(chunks)):
+        if letter is None:              # input chunk used up: pass on what it decoded
+            if result:
+                yield bytes(result)
+                result.clear()
+            continue
+        result.append(letter)
+        if len(result) >= CHUNK_SIZE:
+            yield bytes(result)
+            result.clear()
+    yield bytes(result)
+
+def compress_stream(in_file, out_file, chunk_size=CHUNK_SIZE):
+    """
+    Compress the open binary file in_file (which may be a pipe or a socket)
+    into out_file with adaptive Huffman coding, reading the input only once.
+    """
+    out_file.write(ADAPTIVE_MAGIC)
+    out_file.flush()
+    for data in adaptive_encode(_read_chunks(in_file, chunk_size)):
+        out_file.write(data)
+        out_file.flush()
+
+def decompress_stream(in_file, out_file, chunk_size=CHUNK_SIZE):
+    """Decompress a stream written by compress_stream() from in_file into out_file."""
+    if in_file.read(len(ADAPTIVE_MAGIC)) != ADAPTIVE_MAGIC:
+        raise ValueError('Not an adaptive Huffman stream')
+    for data in adaptive_decode(_read_chunks(in_file, chunk_size)):
+        out_file.write(data)
+        out_file.flush()
+
 def huffman(file_path):
     """
     Parse the file, build the tree, then run through the file again,
-    using the list of Letters to find and print out the bitstring for each letter.
+    using the code table to find and print out the bitstring for each letter.
     """
-    letter_list = parse_file(file_path)
-    root = build_tree(letters_list)
-    letters = traverse_tree(root, "")
+    letters = parse_file(file_path)
+    if not letters:
+        return
+    table = code_table(canonical_codes(code_lengths(build_tree(letters))))
     print(f"Huffman Coding of {file_path}: ")
-    with open(file_path) as f:
+    with open(file_path, 'rb') as f:
         while True:
-            c = f.read(1)
-            if not c:
-                break 
-            le = list(filter(lambda l: l.letter == c, letters))[0]
-            print(le.bitstring, end=' ')
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            print(' '.join(map(table.__getitem__, chunk)), end=' ')
     print()
 
 if __name__ == '__main__':
-    huffman(sys.argv[1])
\ No newline at end of file
+    if len(sys.argv) == 4 and sys.argv[1] == 'compress':
+        compress(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) == 4 and sys.argv[1] == 'decompress':
+        decompress(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) == 2 and sys.argv[1] == 'compress-stream':
+        compress_stream(sys.stdin.buffer, sys.stdout.buffer)
+    elif len(sys.argv) == 2 and sys.argv[1] == 'decompress-stream':
+        decompress_stream(sys.stdin.buffer, sys.stdout.buffer)
+    elif len(sys.argv) == 4 and sys.argv[1] == 'compress-blocks':
+        compress_blocks(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) == 4 and sys.argv[1] == 'decompress-blocks':
+        decompress_blocks(sys.argv[2], sys.argv[3])
+    else:
+        huffman(sys.argv[1])
@@ -0,0 +1,22 @@
+import unittest
+
+from Chapter10.cache import ExpiringMap
+
+
+class TestExpiringMap(unittest.TestCase):
+
+    def test_none_ttl_never_expires(self):
+        now = [0]
+        m = ExpiringMap(ttl=10, clock=lambda: now[0])
+        m.set('forever', 1, None)
+        m['default'] = 2
+        m.set('long', 3, 50)
+        now[0] = 20
+        self.assertEqual(m.get('forever'), 1)
+        self.assertIsNone(m.ttl('forever'))
+        self.assertNotIn('default', m)
+        self.assertEqual(m.ttl('long'), 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import threading
+import unittest
+
+from Chapter10.map import CompactProbeHashMap, ConcurrentHashMap, ProbeHashMap
+
+
+class TestIncrementalProbeHashMap(unittest.TestCase):
+    """Incremental resizing must not hang probing an old table without empty slots."""
+
+    def check(self, m, n):
+        for k in range(n):
+            m[k] = k
+        for k in range(n):
+            self.assertEqual(m[k], k)
+        self.assertNotIn(n, m)
+        self.assertEqual(len(m), n)
+        self.assertEqual(sorted(m), list(range(n)))
+
+    def test_single_step(self):
+        self.check(ProbeHashMap(incremental=True, step=1), 1000)
+
+    def test_high_load(self):
+        self.check(ProbeHashMap(incremental=True, max_load=0.9), 1000)
+
+    def test_full_load_rejected(self):
+        for max_load in (1.0, 1.5):
+            with self.assertRaises(ValueError):
+                ProbeHashMap(max_load=max_load)
+        self.check(ProbeHashMap(max_load=0.99), 50)
+
+
+class TestCompactProbeHashMap(unittest.TestCase):
+    """Robin Hood probing must never be left without an empty slot."""
+
+    def test_full_load_rejected(self):
+        for max_load in (1.0, 1.5):
+            with self.assertRaises(ValueError):
+                CompactProbeHashMap(max_load=max_load)
+        m = CompactProbeHashMap(cap=1, max_load=0.99)
+        for k in range(50):
+            m[k] = k
+        self.assertEqual(sorted(m.items()), [(k, k) for k in range(50)])
+
+
+class TestConcurrentHashMap(unittest.TestCase):
+    """pop, setdefault and popitem must each act atomically on their segment."""
+
+    def run_threads(self, target, count=4):
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def test_pop_with_default(self):
+        m = ConcurrentHashMap(segments=4)
+        errors = []
+        def work():
+            for _ in range(50):
+                for k in range(100):
+                    m[k] = k
+                    try:
+                        m.pop(k, None)
+                    except KeyError:
+                        errors.append(k)
+        self.run_threads(work)
+        self.assertEqual(errors, [])
+        self.assertIsNone(m.pop(0, None))
+        with self.assertRaises(KeyError):
+            m.pop(0)
+
+    def test_setdefault_keeps_first_value(self):
+        m = ConcurrentHashMap(segments=4)
+        results = []
+        def work():
+            results.append(m.setdefault('k', threading.get_ident()))
+        self.run_threads(work, 8)
+        self.assertEqual(set(results), {m['k']})
+
+    def test_popitem(self):
+        m = ConcurrentHashMap(segments=4)
+        for k in range(10):
+            m[k] = -k
+        popped = dict(m.popitem() for _ in range(10))
+        self.assertEqual(popped, {k: -k for k in range(10)})
+        with self.assertRaises(KeyError):
+            m.popitem()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+from Chapter11.search_tree import AVLTreeMap, RedBlackTreeMap, SplayTreeMap, TreeMap
+
+
+class TestBulkOperations(unittest.TestCase):
+    """join, split, union and intersection must not recurse once per level of a deep tree."""
+
+    def build(self, T, keys, sign=1):
+        m = T()
+        for k in keys:
+            m[k] = sign * k
+        return m
+
+    def test_degenerate_trees(self):
+        for T in (TreeMap, SplayTreeMap, AVLTreeMap, RedBlackTreeMap):
+            with self.subTest(T=T.__name__):
+                low, high = self.build(T, range(3000)).split(1500)
+                self.assertEqual(list(low), list(range(1500)))
+                self.assertEqual(list(high), list(range(1500, 3000)))
+                low.join(high)
+                self.assertEqual(list(low), list(range(3000)))
+                other = self.build(T, range(1000, 5000), -1)
+                low.union(other)
+                self.assertEqual(len(low), 5000)
+                self.assertEqual(low[2000], -2000)
+                self.assertEqual(len(other), 0)
+                low.intersection(self.build(T, range(0, 6000, 2)))
+                self.assertEqual(list(low), list(range(0, 5000, 2)))
+
+    def test_red_black_split_roots_are_black(self):
+        for n in range(1, 40):
+            for k in range(n + 1):
+                low, high = self.build(RedBlackTreeMap, range(n)).split(k)
+                for piece in (low, high):
+                    if piece._root is not None:
+                        self.assertFalse(piece._root._red)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,19 @@
+import unittest
+
+from Chapter10.map import ProbeHashMap
+from Chapter10.sketch import CuckooFilter, FilteredMap
+
+
+class TestFilteredMap(unittest.TestCase):
+
+    def test_full_cuckoo_filter_does_not_reject_writes(self):
+        m = FilteredMap(ProbeHashMap(), CuckooFilter(10))
+        for k in range(1000):
+            m[k] = k
+        for k in range(1000):
+            self.assertEqual(m[k], k)
+        self.assertNotIn(1000, m)
+
+
+if __name__ == '__main__':
+    unittest.main()